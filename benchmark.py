@@ -0,0 +1,410 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import requests as rq
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Literal
+
+from core import Config, GQLSession, MessageColumns, MessageFormatter, MessageRecord, ModLogClient, Timer
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+class StubHistory:
+    page_size: int = 100
+    interval: int = 30
+    streams: int = 10
+
+    def __init__(self, size: int, newest: float | None = None) -> None:
+        self.size: int = size
+        self.newest: float = newest if newest is not None else time.time() - 60
+        self.span: float = size * self.interval
+
+    @staticmethod
+    def iso(timestamp: float) -> str:
+        return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    def edge(self, i: int) -> dict:
+        return {
+            "cursor": str(i),
+            "node": {
+                "id": f"m{i}",
+                "sentAt": self.iso(self.newest - i * self.interval),
+                "sender": {"id": "sender", "displayName": "Sender"},
+                "content": {"text": f"synthetic message number {i}"}
+            }
+        }
+
+    def messages(self, cursor: str) -> dict:
+        start: int = int(cursor) + 1 if cursor else 0
+        end: int = min(start + self.page_size, self.size)
+
+        return {
+            "edges": [self.edge(i) for i in range(start, end)],
+            "pageInfo": {"hasNextPage": end < self.size}
+        }
+
+    def videos(self, limit: int) -> list[dict]:
+        window: float = self.span / self.streams
+
+        return [
+            {"node": {"publishedAt": self.iso(self.newest - (k + 1) * window), "lengthSeconds": int(window / 2)}}
+            for k in range(min(limit, self.streams))
+        ]
+
+
+class StubGQLHandler(BaseHTTPRequestHandler):
+    server: "StubGQLServer"
+    protocol_version: str = "HTTP/1.1"
+    disable_nagle_algorithm: bool = True
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def respond(self, payload: dict) -> dict:
+        variables: dict = payload.get("variables", {})
+        operation_name: str = payload.get("operationName", "")
+
+        if operation_name == "ViewerCardModLogsMessagesBySender":
+            return {"data": {"logs": {"messages": self.server.history.messages(variables["cursor"])}}}
+
+        if operation_name == "GetUserID":
+            return {"data": {"user": {"id": f"id-{variables['login']}"}}}
+
+        if operation_name == "FilterableVideoTower_Videos":
+            return {"data": {"user": {"videos": {"edges": self.server.history.videos(variables["limit"])}}}}
+
+        return {"errors": [{"message": f"unknown operation {operation_name}"}]}
+
+    def do_POST(self) -> None:
+        payload: dict | list = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        error: tuple[int, float | None] | None = self.server.count_request()
+
+        if error is not None:
+            self.send_response(error[0])
+
+            if error[1] is not None:
+                self.send_header("Retry-After", str(error[1]))
+
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if isinstance(payload, list):
+            body: bytes = json.dumps([self.respond(item) for item in payload]).encode()
+        else:
+            body = json.dumps(self.respond(payload)).encode()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StubGQLServer(ThreadingHTTPServer):
+    daemon_threads: bool = True
+
+    def __init__(self, history: StubHistory, latency: float = 0.0) -> None:
+        super().__init__(("127.0.0.1", 0), StubGQLHandler)
+
+        self.history: StubHistory = history
+        self.latency: float = latency
+        self.connections: int = 0
+        self.requests: int = 0
+        self.errors: deque[tuple[int, float | None]] = deque()
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/gql"
+
+    def count_request(self) -> tuple[int, float | None] | None:
+        with self.lock:
+            self.requests += 1
+            return self.errors.popleft() if self.errors else None
+
+    def process_request(self, request, client_address) -> None:
+        self.connections += 1
+        super().process_request(request, client_address)
+
+    def __enter__(self) -> "StubGQLServer":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class BenchClient(ModLogClient):
+    def console_print(self, text: str, type_: Literal["error", "success"] = None) -> None:
+        if type_ == "error":
+            print(text, file=sys.stderr)
+
+    def console_write(self, text: str) -> None:
+        pass
+
+    def show_messages(self, display_messages: list[str]) -> None:
+        pass
+
+
+def peak_rss() -> float | None:
+    if resource is None:
+        return None
+
+    rss: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024
+
+
+def run_mode(mode: str, size: int, latency: float, save: bool, rate: float, prefetch: int) -> dict:
+    history: StubHistory = StubHistory(size)
+
+    with tempfile.TemporaryDirectory() as directory, StubGQLServer(history, latency) as server:
+        os.chdir(directory)
+
+        with open("data.json", "w", encoding="UTF-8") as file:
+            json.dump({"channels": {"bench": "channel"}, "user_data": {"client-id": "bench"},
+                       "user_id": ["sender", "sender"],
+                       "network": {"url": server.url, "rate": rate, "burst": max(int(rate), 1),
+                                   "prefetch": prefetch}}, file)
+
+        client: BenchClient = BenchClient(Config())
+        kwargs: dict = {
+            "all": {},
+            "last": {"max_messages": size // 2},
+            "stream": {"streams_ago": 3},
+            "annotate": {"streams_ago": 3, "annotate": True}
+        }[mode]
+
+        with Timer() as timer:
+            client.run_export({"bench": "channel"}, "sender", save_messages=save, **kwargs)
+
+        stats: dict = client.metrics.snapshot()
+
+    return {
+        "mode": mode,
+        "size": size,
+        "pages_per_sec": stats["pages_per_sec"],
+        "messages_per_sec": stats["messages_per_sec"],
+        "messages": stats["messages"],
+        "elapsed": timer.elapsed,
+        "peak_rss": peak_rss()
+    }
+
+
+def bench_connections(pages: int = 200, latency: float = 0.0) -> dict:
+    result: dict = {"name": "connections", "pages": pages}
+
+    for name in ["fresh", "pooled"]:
+        with StubGQLServer(StubHistory(pages * StubHistory.page_size), latency) as server, \
+                GQLSession(server.url) as session:
+            post: Callable[[dict], rq.Response] = partial(session.gql, {})
+
+            if name == "fresh":
+                post = lambda payload: rq.post(server.url, json=payload, timeout=session.timeout)  # noqa
+
+            cursor: str = ""
+            start: float = time.perf_counter()
+
+            for _ in range(pages):
+                payload: dict = ModLogClient.gql_payload(*ModLogClient.mod_logs_operation("channel", "sender", cursor))
+                cursor = post(payload).json()["data"]["logs"]["messages"]["edges"][-1]["cursor"]
+
+            elapsed: float = time.perf_counter() - start
+
+        result[f"{name}_connections"] = server.connections
+        result[f"{name}_page_ms"] = elapsed / pages * 1000
+
+    return result
+
+
+def legacy_get_data(path: str) -> dict:
+    valid: bool = False
+
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="UTF-8") as file:
+                data: dict = json.load(file)
+
+            valid = "channels" in data and "user_data" in data and "user_id" in data
+        except json.decoder.JSONDecodeError:
+            pass
+
+    if not valid:
+        with open(path, "w", encoding="UTF-8") as file:
+            json.dump({"channels": {}, "user_data": {}, "user_id": None}, file, indent=4)
+
+    with open(path, "r", encoding="UTF-8") as file:
+        return json.load(file)
+
+
+def bench_config(calls: int = 10000) -> dict:
+    result: dict = {"name": "config_get", "calls": calls}
+
+    with tempfile.TemporaryDirectory() as directory:
+        config: Config = Config(os.path.join(directory, "data.json"))
+        config.get()
+
+        for name, get in [("legacy", partial(legacy_get_data, config.path)), ("current", config.get)]:
+            start: float = time.perf_counter()
+
+            for _ in range(calls):
+                get()
+
+            result[f"{name}_per_call_us"] = (time.perf_counter() - start) / calls * 1e6
+
+    return result
+
+
+def synthetic_records(history: StubHistory, start: int, end: int) -> list[MessageRecord]:
+    return [
+        MessageRecord.from_row({"id": f"m{i}", "sent_at": history.iso(history.newest - i * history.interval),
+                                "sent_ts": history.newest - i * history.interval, "channel_id": "channel",
+                                "sender_id": f"sender{i % 50}", "display_name": f"Sender{i % 50}",
+                                "text": f"synthetic message number {i}"}, history.newest - history.span)
+        for i in range(start, end)
+    ]
+
+
+def legacy_format_page(records: list[MessageRecord], with_timecodes: bool = False) -> list[str]:
+    messages: list[str] = []
+
+    for record in records:
+        message_date_obj_utc: datetime = datetime.fromisoformat(record.sent_at.replace("Z", "+00:00"))
+        message_date_obj: datetime = message_date_obj_utc.astimezone()
+        stream_timecode: str = ""
+
+        if with_timecodes and record.stream_start is not None:
+            seconds_diff: float = record.sent_ts - record.stream_start
+            stream_timecode_obj: datetime = datetime(1, 1, 1) + timedelta(seconds=seconds_diff)
+            stream_timecode = f"[{stream_timecode_obj.strftime('%H:%M:%S')}] "
+
+        main_message: str = f"{record.display_name}: {record.text}"
+
+        messages.append(stream_timecode + f"({message_date_obj_utc.strftime('%d.%m.%Y %H:%M:%S')}) {main_message}")
+        messages.append(stream_timecode + f"({message_date_obj.strftime('%d.%m.%Y %H:%M:%S')}) {main_message}")
+
+    return messages
+
+
+def bench_format_page(size: int) -> dict:
+    history: StubHistory = StubHistory(size)
+    records: list[MessageRecord] = synthetic_records(history, 0, size)
+    formatter: MessageFormatter = MessageFormatter()
+
+    def current(page: list[MessageRecord]) -> None:
+        formatter.format_page(page, with_timecodes=True)
+        formatter.format_page(page, with_timecodes=True, local=True)
+
+    result: dict = {"name": "format_page", "messages": size}
+
+    for name, format_page in [("legacy", partial(legacy_format_page, with_timecodes=True)), ("current", current)]:
+        start: float = time.perf_counter()
+
+        for i in range(0, size, 100):
+            format_page(records[i:i + 100])
+
+        result[f"{name}_messages_per_sec"] = size / (time.perf_counter() - start)
+
+    return result
+
+
+def bench_memory(size: int, compact: bool) -> dict:
+    history: StubHistory = StubHistory(size)
+    formatter: MessageFormatter = MessageFormatter()
+    messages: MessageColumns | list[str] = MessageColumns() if compact else []
+
+    tracemalloc.start()
+
+    for i in range(0, size, 100):
+        records: list[MessageRecord] = synthetic_records(history, i, min(i + 100, size))
+
+        if compact:
+            for record in records:
+                messages.append(record)
+        else:
+            messages.extend(formatter.format_page(records, with_timecodes=True))
+            messages.extend(formatter.format_page(records, with_timecodes=True, local=True))
+
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"name": "memory_columns" if compact else "memory_formatted", "messages": size,
+            "bytes_per_message": current / size, "peak_mib": peak / 1024 / 1024}
+
+
+def isolated(function: Callable, *args) -> dict:
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        return pool.submit(function, *args).result()
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the fetch pipeline against a local stub GQL server.")
+
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000], help="history sizes in messages")
+    parser.add_argument("--modes", nargs="+", choices=["all", "last", "stream", "annotate"],
+                        default=["all", "last", "stream", "annotate"])
+    parser.add_argument("--latency", type=float, default=0.0, help="injected server latency in milliseconds")
+    parser.add_argument("--rate", type=float, default=1e6, help="client request rate limit per second")
+    parser.add_argument("--prefetch", type=int, default=ModLogClient.prefetch, help="pages fetched ahead")
+    parser.add_argument("--memory-size", type=int, default=1000000, help="messages for the memory benchmark")
+    parser.add_argument("--save", action="store_true", help="also export messages to files")
+    parser.add_argument("--json", help="write results as JSON to this path")
+
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args: argparse.Namespace = parse_args(argv)
+    results: dict = {"pipeline": [], "micro": []}
+
+    print(f"{'mode':<10}{'size':>10}{'pages/s':>12}{'msgs/s':>14}{'time':>10}{'peak RSS':>12}")
+
+    for size in args.sizes:
+        for mode in args.modes:
+            result: dict = isolated(run_mode, mode, size, args.latency / 1000, args.save, args.rate, args.prefetch)
+            results["pipeline"].append(result)
+
+            rss: str = f"{result['peak_rss']:.1f}MiB" if result["peak_rss"] is not None else "n/a"
+            print(f"{mode:<10}{size:>10}{result['pages_per_sec']:>12.1f}{result['messages_per_sec']:>14.1f}"
+                  f"{result['elapsed']:>9.2f}s{rss:>12}")
+
+    results["micro"].append(isolated(bench_connections, 200, args.latency / 1000))
+    results["micro"].append(bench_config())
+    results["micro"].append(isolated(bench_format_page, max(args.sizes)))
+    results["micro"].append(isolated(bench_memory, args.memory_size, False))
+    results["micro"].append(isolated(bench_memory, args.memory_size, True))
+
+    print()
+
+    for result in results["micro"]:
+        print(", ".join(f"{key}={value:.2f}" if isinstance(value, float) else f"{key}={value}"
+                        for key, value in result.items()))
+
+    if args.json is not None:
+        with open(args.json, "w", encoding="UTF-8") as file:
+            json.dump(results, file, indent=4)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
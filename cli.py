@@ -0,0 +1,140 @@
+import argparse
+import os
+import re
+import sys
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Get mod log messages history without the GUI.")
+
+    parser.add_argument("channels", nargs="*", help="channel logins, or 'all' for every channel in data.json")
+    parser.add_argument("-s", "--senders", default="", help="comma-separated sender logins (default: current user)")
+    parser.add_argument("-m", "--mode", choices=["all", "last", "stream", "annotate", "watch"],
+                        default="all")
+    parser.add_argument("-n", "--count", type=int, default=0, help="messages count for 'last' mode")
+    parser.add_argument("-a", "--streams-ago", type=int, default=0, help="streams ago for 'stream'/'annotate' modes")
+    parser.add_argument("-o", "--output", help="save messages to files in this directory")
+    parser.add_argument("-f", "--format", choices=["txt", "jsonl", "csv"], help="output file format")
+    parser.add_argument("-z", "--gzip", action="store_true", help="compress output files with gzip")
+    parser.add_argument("-t", "--timecodes", action="store_true", help="add stream timecodes")
+    parser.add_argument("--config", default="data.json", help="path to data.json")
+    parser.add_argument("--metrics", help="dump job metrics as JSON to this path")
+    parser.add_argument("--resume", action="store_true", help="resume the last interrupted job")
+    parser.add_argument("--analytics", action="store_true",
+                        help="show stored message analytics instead of fetching (saved as JSON with -o)")
+    parser.add_argument("--import-channels", metavar="FILE", help="add channel logins listed in a file to data.json")
+
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    if getattr(sys, "frozen", False):
+        os.chdir(os.path.dirname(sys.argv[0]))
+
+    args: argparse.Namespace = parse_args(argv)
+
+    from core import Config, ModLogClient
+
+    client: ModLogClient = ModLogClient(Config(args.config))
+    data: dict = client.get_data()
+    senders: list[str] = [login for login in re.split(r"[,\s]+", args.senders.lower()) if login]
+
+    if args.output is not None:
+        client.export_directory = args.output
+
+    if args.format is not None:
+        client.export_format = args.format
+
+    if args.gzip:
+        client.export_gzip = True
+
+    if args.metrics is not None:
+        client.metrics_path = args.metrics
+
+    if args.import_channels is not None:
+        with open(args.import_channels, "r", encoding="UTF-8") as file:
+            logins: list[str] = [login for login in re.split(r"[,\s]+", file.read().lower()) if login]
+
+        found, missing = client.import_channels(logins)
+        client.console_print(f"Imported {len(found)} channels", type_="success")
+
+        if missing:
+            client.console_print(f"Channels not found: {', '.join(missing)}", type_="error")
+
+        return 0 if not missing else 1
+
+    if args.resume:
+        try:
+            if not client.resume_job():
+                client.console_print("Nothing to resume!", type_="error")
+                return 1
+        except KeyboardInterrupt:
+            client.stop_flag = True
+            return 130
+
+        return 0
+
+    if not args.channels:
+        client.console_print("Channel not selected!", type_="error")
+        return 2
+
+    if args.mode == "last" and args.count <= 0:
+        client.console_print("Invalid messages count!", type_="error")
+        return 2
+
+    if args.mode in ["stream", "annotate"] and args.streams_ago <= 0:
+        client.console_print("Invalid streams ago!", type_="error")
+        return 2
+
+    if data["user_id"] is None and not senders:
+        client.console_print("User id not found!", type_="error")
+        return 1
+
+    if args.channels == ["all"]:
+        channels: dict = data["channels"]
+    else:
+        channels = {}
+
+        for channel in args.channels:
+            channel_id: str | None | bool = data["channels"].get(channel) or client.get_id_by_login(channel)
+
+            if not channel_id:
+                client.console_print(f"Channel '{channel}' not found!", type_="error")
+                return 1
+
+            channels[channel] = channel_id
+
+    if channels == {}:
+        client.console_print("No channels added!", type_="error")
+        return 1
+
+    if args.analytics:
+        report: dict = client.analytics(channels, client.resolve_senders(senders), args.streams_ago)
+
+        for line in client.analytics_lines(report):
+            client.console_write(line)
+
+        if args.output is not None:
+            client.console_print(f"Analytics saved to {client.export_analytics(report)}", type_="success")
+
+        return 0
+
+    try:
+        if args.mode == "watch":
+            client.watch(channels, client.resolve_senders(senders), save_messages=args.output is not None)
+            return 0
+
+        client.run_export(channels, data["user_id"][1] if data["user_id"] else None,
+                          max_messages=args.count if args.mode == "last" else 0,
+                          streams_ago=args.streams_ago if args.mode in ["stream", "annotate"] else 0,
+                          senders=senders, annotate=args.mode == "annotate", with_timecodes=args.timecodes,
+                          save_messages=args.output is not None)
+    except KeyboardInterrupt:
+        client.stop_flag = True
+        return 130
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
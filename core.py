@@ -0,0 +1,2075 @@
+import contextvars
+import copy
+import csv
+import gzip
+import heapq
+import io
+import json
+import os
+import queue
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+import requests as rq
+from array import array
+from bisect import bisect_left, bisect_right
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import datetime
+from functools import partial
+from itertools import count, islice
+from math import isnan
+from requests.adapters import HTTPAdapter
+from typing import IO, Any, Callable, Iterator, Literal
+from urllib3.util.retry import Retry
+
+
+class Timer:
+    def __init__(self, metrics: "Metrics | None" = None, stage: str = "") -> None:
+        self.metrics: Metrics | None = metrics
+        self.stage: str = stage
+
+    def __enter__(self) -> "Timer":
+        self.start: float = time.perf_counter()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.end: float = time.perf_counter()
+        self.elapsed: float = self.end - self.start
+
+        if self.metrics is not None:
+            self.metrics.add_time(self.stage, self.elapsed)
+
+
+class Metrics:
+    buckets: tuple[float, ...] = (0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.started: float = time.perf_counter()
+            self.finished: float | None = None
+            self.stages: dict[str, list[float]] = {}
+            self.latencies: list[int] = [0] * (len(self.buckets) + 1)
+            self.bytes_received: int = 0
+            self.pages: int = 0
+            self.messages: int = 0
+            self.ui_blocked: float = 0.0
+            self.throttled: int = 0
+
+    def finish(self) -> None:
+        with self._lock:
+            self.finished = time.perf_counter()
+
+    def timer(self, stage: str) -> Timer:
+        return Timer(self, stage)
+
+    def add_time(self, stage: str, elapsed: float) -> None:
+        with self._lock:
+            stats: list[float] = self.stages.setdefault(stage, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] = max(stats[2], elapsed)
+
+            if stage == "request":
+                self.latencies[bisect_left(self.buckets, elapsed)] += 1
+
+    def add(self, bytes_received: int = 0, pages: int = 0, messages: int = 0, ui_blocked: float = 0.0,
+            throttled: int = 0) -> None:
+        with self._lock:
+            self.bytes_received += bytes_received
+            self.pages += pages
+            self.messages += messages
+            self.ui_blocked += ui_blocked
+            self.throttled += throttled
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            elapsed: float = (self.finished or time.perf_counter()) - self.started
+            labels: list[str] = [f"<={bucket * 1000:g}ms" for bucket in self.buckets] + [f">{self.buckets[-1]:g}s"]
+
+            return {
+                "elapsed": elapsed,
+                "pages": self.pages,
+                "messages": self.messages,
+                "pages_per_sec": self.pages / elapsed if elapsed else 0.0,
+                "messages_per_sec": self.messages / elapsed if elapsed else 0.0,
+                "bytes_received": self.bytes_received,
+                "ui_blocked": self.ui_blocked,
+                "throttled": self.throttled,
+                "stages": {
+                    stage: {"count": count, "total": total, "mean": total / count if count else 0.0, "max": max_}
+                    for stage, (count, total, max_) in self.stages.items()
+                },
+                "request_latency": dict(zip(labels, self.latencies))
+            }
+
+    def dump(self, path: str) -> None:
+        with open(path, "w", encoding="UTF-8") as file:
+            json.dump(self.snapshot(), file, indent=4)
+
+
+class GQLRetry(Retry):
+    RETRY_AFTER_STATUS_CODES: frozenset[int] = frozenset({503})
+
+
+class GQLSession(rq.Session):
+    url: str = "https://gql.twitch.tv/gql"
+
+    def __init__(self, url: str | None = None, timeout: tuple[float, float] = (5, 30), retries: int = 5,
+                 backoff_factor: float = 0.5, pool_size: int = 10) -> None:
+        super().__init__()
+
+        if url is not None:
+            self.url = url
+
+        self.timeout: tuple[float, float] = timeout
+
+        retry: GQLRetry = GQLRetry(total=retries, backoff_factor=backoff_factor,
+                                   status_forcelist=(500, 502, 503, 504), allowed_methods=None,
+                                   respect_retry_after_header=True, raise_on_status=False)
+        adapter: HTTPAdapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    @classmethod
+    def from_settings(cls, settings: dict) -> "GQLSession":
+        return cls(url=settings.get("url"),
+                   timeout=tuple(settings.get("timeout", (5, 30))),
+                   retries=settings.get("retries", 5),
+                   backoff_factor=settings.get("backoff_factor", 0.5),
+                   pool_size=settings.get("pool_size", 10))
+
+    def gql(self, headers: dict, payload: dict | list) -> rq.Response:
+        return self.post(self.url, headers=headers, json=payload, timeout=self.timeout)
+
+
+class RequestScheduler:
+    INTERACTIVE: int = 0
+    BULK: int = 1
+
+    def __init__(self, rate: float = 20.0, burst: int = 20, max_concurrent: int = 4, retries: int = 5,
+                 min_rate: float = 0.5) -> None:
+        self.max_rate: float = rate
+        self.min_rate: float = min(min_rate, rate)
+        self.rate: float = rate
+        self.burst: int = burst
+        self.max_concurrent: int = max_concurrent
+        self.retries: int = retries
+
+        self.tokens: float = float(burst)
+        self.updated: float = time.monotonic()
+        self.paused_until: float = 0.0
+        self.backoff: float = 1.0
+        self.in_flight: int = 0
+        self.waiters: list[tuple[int, int]] = []
+        self.sequence: Iterator[int] = count()
+        self.condition = threading.Condition()
+
+    @classmethod
+    def from_settings(cls, settings: dict) -> "RequestScheduler":
+        return cls(rate=settings.get("rate", 20.0),
+                   burst=settings.get("burst", 20),
+                   max_concurrent=settings.get("max_requests", 4),
+                   retries=settings.get("rate_limit_retries", 5))
+
+    @staticmethod
+    def retry_after(header: str | None) -> float | None:
+        try:
+            return max(float(header), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, priority: int = INTERACTIVE) -> None:
+        with self.condition:
+            ticket: tuple[int, int] = (priority, next(self.sequence))
+            heapq.heappush(self.waiters, ticket)
+
+            while True:
+                now: float = time.monotonic()
+                self._refill(now)
+
+                if self.waiters[0] != ticket or self.in_flight >= self.max_concurrent:
+                    self.condition.wait()
+                    continue
+
+                delay: float = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+
+                if delay <= 0:
+                    break
+
+                self.condition.wait(delay)
+
+            heapq.heappop(self.waiters)
+            self.tokens -= 1
+            self.in_flight += 1
+            self.condition.notify_all()
+
+    def release(self) -> None:
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    @contextmanager
+    def slot(self, priority: int = INTERACTIVE) -> Iterator[None]:
+        self.acquire(priority)
+
+        try:
+            yield
+        finally:
+            self.release()
+
+    def throttle(self, retry_after: float | None = None) -> None:
+        with self.condition:
+            delay: float = retry_after if retry_after is not None else self.backoff
+
+            self.paused_until = max(self.paused_until, time.monotonic() + delay)
+            self.backoff = min(self.backoff * 2, 60.0)
+            self.rate = max(self.rate / 2, self.min_rate)
+            self.tokens = 0.0
+            self.condition.notify_all()
+
+    def success(self) -> None:
+        with self.condition:
+            self.backoff = 1.0
+            self.rate = min(self.rate + self.max_rate / 20, self.max_rate)
+
+
+class Config:
+    def __init__(self, path: str = "data.json") -> None:
+        self.path: str = path
+        self._data: dict | None = None
+        self._mtime: int | None = None
+        self._lock = threading.RLock()
+
+    def _stat(self) -> int | None:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _load(self) -> None:
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="UTF-8") as file:
+                    data = json.load(file)
+
+                if "channels" in data and "user_data" in data and "user_id" in data:
+                    self._data = data
+                    self._mtime = self._stat()
+                    return
+            except json.decoder.JSONDecodeError:
+                pass
+
+        self._save({"channels": {}, "user_data": {}, "user_id": None})
+
+    def _save(self, data: dict) -> None:
+        directory: str = os.path.dirname(os.path.abspath(self.path))
+
+        with tempfile.NamedTemporaryFile("w", encoding="UTF-8", dir=directory, suffix=".tmp",
+                                         delete=False) as file:
+            json.dump(data, file, indent=4)
+            file.flush()
+            os.fsync(file.fileno())
+
+        os.replace(file.name, self.path)
+
+        self._data = data
+        self._mtime = self._stat()
+
+    def get(self) -> dict:
+        with self._lock:
+            if self._data is None or self._stat() != self._mtime:
+                self._load()
+
+            return self._data
+
+    def update(self, update: Callable[[dict], dict]) -> None:
+        with self._lock:
+            self._save(update(copy.deepcopy(self.get())))
+
+
+class MessageStore:
+    def __init__(self, path: str = "messages.db") -> None:
+        self.path: str = path
+        self._local = threading.local()
+
+        with self.connection as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS messages (
+                    channel_id TEXT NOT NULL,
+                    sender_id TEXT NOT NULL,
+                    id TEXT NOT NULL,
+                    sent_at TEXT NOT NULL,
+                    sent_ts REAL NOT NULL,
+                    display_name TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    cursor TEXT NOT NULL,
+                    PRIMARY KEY (channel_id, sender_id, id)
+                );
+                CREATE INDEX IF NOT EXISTS messages_sent_ts ON messages (channel_id, sender_id, sent_ts);
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    channel_id TEXT NOT NULL,
+                    sender_id TEXT NOT NULL,
+                    cursor TEXT NOT NULL,
+                    complete INTEGER NOT NULL,
+                    synced_at REAL,
+                    PRIMARY KEY (channel_id, sender_id)
+                );
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY,
+                    params TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    pages INTEGER NOT NULL DEFAULT 0,
+                    messages INTEGER NOT NULL DEFAULT 0,
+                    started_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+            """)
+
+            columns: set[str] = {row["name"] for row in conn.execute("PRAGMA table_info(sync_state)")}
+
+            if "synced_at" not in columns:
+                conn.execute("ALTER TABLE sync_state ADD COLUMN synced_at REAL")
+
+            conn.execute("CREATE INDEX IF NOT EXISTS messages_display_name ON messages "
+                         "(display_name COLLATE NOCASE, sent_ts)")
+            conn.execute("CREATE INDEX IF NOT EXISTS messages_time ON messages (sent_ts)")
+
+            aggregated: bool = bool(conn.execute("SELECT 1 FROM sqlite_master "
+                                                 "WHERE name = 'message_totals'").fetchall())
+
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS message_totals (
+                    channel_id TEXT NOT NULL,
+                    sender_id TEXT NOT NULL,
+                    display_name TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    first_ts REAL NOT NULL,
+                    last_ts REAL NOT NULL,
+                    PRIMARY KEY (channel_id, sender_id)
+                );
+                CREATE TABLE IF NOT EXISTS message_minutes (
+                    channel_id TEXT NOT NULL,
+                    sender_id TEXT NOT NULL,
+                    minute INTEGER NOT NULL,
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY (channel_id, sender_id, minute)
+                ) WITHOUT ROWID;
+                CREATE TRIGGER IF NOT EXISTS messages_aggregate_insert AFTER INSERT ON messages BEGIN
+                    INSERT INTO message_totals
+                    VALUES (new.channel_id, new.sender_id, new.display_name, 1, new.sent_ts, new.sent_ts)
+                    ON CONFLICT (channel_id, sender_id) DO UPDATE SET
+                        display_name = CASE WHEN excluded.last_ts >= last_ts THEN excluded.display_name
+                                       ELSE display_name END,
+                        count = count + 1,
+                        first_ts = MIN(first_ts, excluded.first_ts),
+                        last_ts = MAX(last_ts, excluded.last_ts);
+                    INSERT INTO message_minutes
+                    VALUES (new.channel_id, new.sender_id, CAST(new.sent_ts / 60 AS INTEGER), 1)
+                    ON CONFLICT (channel_id, sender_id, minute) DO UPDATE SET count = count + 1;
+                END;
+            """)
+
+            if not aggregated:
+                conn.executescript("""
+                    INSERT INTO message_totals
+                    SELECT channel_id, sender_id, '', COUNT(*), MIN(sent_ts), MAX(sent_ts) FROM messages
+                    GROUP BY channel_id, sender_id;
+                    UPDATE message_totals SET display_name = (
+                        SELECT display_name FROM messages WHERE messages.channel_id = message_totals.channel_id
+                        AND messages.sender_id = message_totals.sender_id ORDER BY sent_ts DESC LIMIT 1
+                    );
+                    INSERT INTO message_minutes
+                    SELECT channel_id, sender_id, CAST(sent_ts / 60 AS INTEGER) AS minute, COUNT(*) FROM messages
+                    GROUP BY channel_id, sender_id, minute;
+                """)
+
+            self.fts: bool = True
+            indexed: bool = bool(conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'messages_fts'").fetchall())
+
+            try:
+                conn.executescript("""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5 (
+                        display_name, text, content='messages', content_rowid='rowid', tokenize='unicode61'
+                    );
+                    CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+                        INSERT INTO messages_fts (rowid, display_name, text)
+                        VALUES (new.rowid, new.display_name, new.text);
+                    END;
+                """)
+            except sqlite3.OperationalError:
+                self.fts = False
+            else:
+                if not indexed:
+                    conn.execute("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')")
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        conn: sqlite3.Connection | None = getattr(self._local, "conn", None)
+
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+
+        return conn
+
+    @staticmethod
+    def parse_date(date: str) -> datetime:
+        return datetime.fromisoformat(date.replace("Z", "+00:00"))
+
+    def _insert_edges(self, channel_id: str, sender_id: str, edges: list) -> None:
+        rows: list[tuple] = []
+
+        for edge in edges:
+            node: dict = edge["node"]
+            rows.append((channel_id, sender_id, node["id"], node["sentAt"], self.parse_date(node["sentAt"]).timestamp(),
+                         node["sender"]["displayName"], node["content"]["text"], edge["cursor"]))
+
+        self.connection.executemany("INSERT OR IGNORE INTO messages VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def add_edges(self, channel_id: str, sender_id: str, edges: list, synced_at: float | None = None) -> None:
+        with self.connection:
+            self._insert_edges(channel_id, sender_id, edges)
+
+            if synced_at is not None:
+                self._set_synced_at(channel_id, sender_id, synced_at)
+
+    def add_page(self, channel_id: str, sender_id: str, edges: list, cursor: str, complete: bool,
+                 synced_at: float | None = None) -> None:
+        with self.connection:
+            self._insert_edges(channel_id, sender_id, edges)
+            self._set_state(channel_id, sender_id, cursor, complete)
+
+            if synced_at is not None:
+                self._set_synced_at(channel_id, sender_id, synced_at)
+
+    def known_ids(self, channel_id: str, sender_id: str, ids: list[str]) -> set[str]:
+        if not ids:
+            return set()
+
+        placeholders: str = ", ".join("?" * len(ids))
+        rows: list = self.connection.execute(f"SELECT id FROM messages WHERE channel_id = ? AND sender_id = ? "
+                                             f"AND id IN ({placeholders})", (channel_id, sender_id, *ids)).fetchall()
+        return {row["id"] for row in rows}
+
+    def count(self, channel_id: str, sender_id: str, since: float | None = None, until: float | None = None) -> int:
+        if since is None and until is None:
+            row: sqlite3.Row | None = self.totals(channel_id, sender_id)
+            return row["count"] if row is not None else 0
+
+        return self.connection.execute("SELECT COUNT(*) FROM messages WHERE channel_id = ? AND sender_id = ? "
+                                       "AND sent_ts >= ? AND sent_ts <= ?",
+                                       (channel_id, sender_id, since or 0, until or time.time())).fetchone()[0]
+
+    def oldest(self, channel_id: str, sender_id: str) -> float | None:
+        row: sqlite3.Row | None = self.totals(channel_id, sender_id)
+        return row["first_ts"] if row is not None else None
+
+    def totals(self, channel_id: str, sender_id: str) -> sqlite3.Row | None:
+        return self.connection.execute("SELECT * FROM message_totals WHERE channel_id = ? AND sender_id = ?",
+                                       (channel_id, sender_id)).fetchone()
+
+    def timeline(self, channel_id: str, sender_id: str) -> list[tuple[int, int]]:
+        return [(row["minute"] * 60, row["count"]) for row in self.connection.execute(
+            "SELECT minute, count FROM message_minutes WHERE channel_id = ? AND sender_id = ? ORDER BY minute",
+            (channel_id, sender_id))]
+
+    def hours(self, channel_id: str, sender_id: str) -> dict[str, int]:
+        return {row["hour"]: row["count"] for row in self.connection.execute(
+            "SELECT strftime('%H', minute * 60, 'unixepoch', 'localtime') AS hour, SUM(count) AS count "
+            "FROM message_minutes WHERE channel_id = ? AND sender_id = ? GROUP BY hour ORDER BY hour",
+            (channel_id, sender_id))}
+
+    def get_state(self, channel_id: str, sender_id: str) -> tuple[str, bool, float | None]:
+        row: sqlite3.Row | None = self.connection.execute(
+            "SELECT cursor, complete, synced_at FROM sync_state WHERE channel_id = ? AND sender_id = ?",
+            (channel_id, sender_id)).fetchone()
+
+        return (row["cursor"], bool(row["complete"]), row["synced_at"]) if row else ("", False, None)
+
+    def _set_state(self, channel_id: str, sender_id: str, cursor: str, complete: bool) -> None:
+        self.connection.execute("INSERT INTO sync_state (channel_id, sender_id, cursor, complete) VALUES (?, ?, ?, ?) "
+                                "ON CONFLICT (channel_id, sender_id) DO UPDATE SET cursor = excluded.cursor, "
+                                "complete = excluded.complete", (channel_id, sender_id, cursor, int(complete)))
+
+    def _set_synced_at(self, channel_id: str, sender_id: str, synced_at: float) -> None:
+        self.connection.execute("UPDATE sync_state SET synced_at = ? WHERE channel_id = ? AND sender_id = ?",
+                                (synced_at, channel_id, sender_id))
+
+    def set_state(self, channel_id: str, sender_id: str, cursor: str, complete: bool,
+                  synced_at: float | None = None) -> None:
+        with self.connection:
+            self._set_state(channel_id, sender_id, cursor, complete)
+
+            if synced_at is not None:
+                self._set_synced_at(channel_id, sender_id, synced_at)
+
+    def messages(self, channel_id: str, sender_id: str, limit: int = 0, since: float | None = None,
+                 until: float | None = None,
+                 before: tuple[float, str, str, str] | None = None) -> Iterator[sqlite3.Row]:
+        query: str = "SELECT * FROM messages WHERE channel_id = ? AND sender_id = ?"
+        params: list = [channel_id, sender_id]
+
+        if since is not None:
+            query += " AND messages.sent_ts >= ?"
+            params.append(since)
+
+        if until is not None:
+            query += " AND sent_ts <= ?"
+            params.append(until)
+
+        if before is not None and limit == 0:
+            query += " AND (sent_ts, id, channel_id, sender_id) < (?, ?, ?, ?)"
+            params.extend(before)
+
+        query += " ORDER BY sent_ts DESC, id DESC"
+
+        if limit != 0:
+            query += " LIMIT ?"
+            params.append(limit)
+
+            if before is not None:
+                query = (f"SELECT * FROM ({query}) WHERE (sent_ts, id, channel_id, sender_id) < (?, ?, ?, ?) "
+                         f"ORDER BY sent_ts DESC, id DESC")
+                params.extend(before)
+
+        yield from self.connection.execute(query, params)
+
+    def start_job(self, params: dict, job_id: int | None = None) -> int:
+        now: float = time.time()
+
+        with self.connection as conn:
+            if job_id is None:
+                return conn.execute("INSERT INTO jobs (params, status, started_at, updated_at) "
+                                    "VALUES (?, 'running', ?, ?)", (json.dumps(params), now, now)).lastrowid
+
+            conn.execute("UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ?", (now, job_id))
+
+        return job_id
+
+    def checkpoint_job(self, job_id: int | None) -> None:
+        if job_id is None:
+            return
+
+        with self.connection as conn:
+            conn.execute("UPDATE jobs SET pages = pages + 1, updated_at = ? WHERE id = ?", (time.time(), job_id))
+
+    def finish_job(self, job_id: int, status: Literal["done", "stopped", "failed"], messages: int) -> None:
+        with self.connection as conn:
+            conn.execute("UPDATE jobs SET status = ?, messages = ?, updated_at = ? WHERE id = ?",
+                         (status, messages, time.time(), job_id))
+
+    def last_job(self, exclude: set[int] | None = None) -> tuple[int, dict, str, int] | None:
+        excluded: list[int] = sorted(exclude or [])
+        row: sqlite3.Row | None = self.connection.execute(
+            f"SELECT * FROM jobs WHERE id NOT IN ({", ".join("?" * len(excluded))}) "
+            f"ORDER BY updated_at DESC, id DESC LIMIT 1", excluded).fetchone()
+
+        if row is None or row["status"] == "done":
+            return None
+
+        return row["id"], json.loads(row["params"]), row["status"], row["pages"]
+
+    def scan_by_time(self, channel_id: str, limit: int) -> bool:
+        row: sqlite3.Row = self.connection.execute(
+            "SELECT COALESCE(SUM(count), 0) AS channel, (SELECT COALESCE(SUM(count), 0) FROM message_totals) AS total "
+            "FROM message_totals WHERE channel_id = ?", (channel_id,)).fetchone()
+        return row["channel"] * row["channel"] >= limit * row["total"]
+
+    def search(self, words: list[str], display_name: str | None = None, channel_id: str | None = None,
+               since: float | None = None, until: float | None = None, limit: int = 1000) -> list[sqlite3.Row]:
+        params: list = []
+
+        if words and self.fts:
+            query: str = ("SELECT messages.* FROM messages_fts CROSS JOIN messages "
+                          "ON messages.rowid = messages_fts.rowid WHERE messages_fts MATCH ?")
+            params.append(" ".join('"{}"'.format(word.replace('"', '""')) for word in words))
+        else:
+            query = "SELECT messages.* FROM messages WHERE 1"
+
+            for word in words:
+                query += " AND text LIKE ?"
+                params.append(f"%{word}%")
+
+        if display_name is not None:
+            query += " AND messages.display_name = ? COLLATE NOCASE"
+            params.append(display_name)
+
+        if channel_id is not None:
+            query += f" AND {"+" if self.scan_by_time(channel_id, limit) else ""}messages.channel_id = ?"
+            params.append(channel_id)
+
+        if since is not None:
+            query += " AND messages.sent_ts >= ?"
+            params.append(since)
+
+        if until is not None:
+            query += " AND messages.sent_ts < ?"
+            params.append(until)
+
+        query += " ORDER BY messages.sent_ts DESC LIMIT ?"
+        params.append(limit)
+
+        return self.connection.execute(query, params).fetchall()
+
+
+class LookupCache:
+    ttls: dict[str, float] = {
+        "GetUserID": 7 * 24 * 3600,
+        "FilterableVideoTower_Videos": 10 * 60
+    }
+    negative_ttl: float = 60
+
+    def __init__(self, path: str = "cache.db", ttls: dict[str, float] | None = None, max_size: int = 1024,
+                 negative_ttl: float | None = None) -> None:
+        self.path: str = path
+        self.max_size: int = max_size
+        self.hits: int = 0
+        self.misses: int = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        if ttls is not None:
+            self.ttls = {**self.ttls, **ttls}
+
+        if negative_ttl is not None:
+            self.negative_ttl = negative_ttl
+
+        with self.connection as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS lookups (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    used_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS lookups_used_at ON lookups (used_at)")
+
+    @classmethod
+    def from_settings(cls, settings: dict) -> "LookupCache":
+        return cls(path=settings.get("path", "cache.db"),
+                   ttls=settings.get("ttls"),
+                   max_size=settings.get("max_size", 1024),
+                   negative_ttl=settings.get("negative_ttl"))
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        conn: sqlite3.Connection | None = getattr(self._local, "conn", None)
+
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+
+        return conn
+
+    @staticmethod
+    def key(operation_name: str, variables: dict) -> str:
+        return f"{operation_name}:{json.dumps(variables, sort_keys=True, separators=(',', ':'))}"
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, operation_name: str, variables: dict) -> dict | None:
+        if operation_name not in self.ttls:
+            return None
+
+        key: str = self.key(operation_name, variables)
+        now: float = time.time()
+
+        with self.connection as conn:
+            row: tuple | None = conn.execute("SELECT response, expires_at FROM lookups WHERE key = ?",
+                                             (key,)).fetchone()
+
+            if row is None or row[1] <= now:
+                if row is not None:
+                    conn.execute("DELETE FROM lookups WHERE key = ?", (key,))
+
+                self._count(False)
+                return None
+
+            conn.execute("UPDATE lookups SET used_at = ? WHERE key = ?", (now, key))
+
+        self._count(True)
+        return json.loads(row[0])
+
+    def put(self, operation_name: str, variables: dict, response: dict) -> None:
+        if operation_name not in self.ttls:
+            return
+
+        now: float = time.time()
+        ttl: float = self.ttls[operation_name]
+
+        if not any((response.get("data") or {}).values()):
+            ttl = min(ttl, self.negative_ttl)
+
+        with self.connection as conn:
+            conn.execute("INSERT OR REPLACE INTO lookups (key, response, expires_at, used_at) VALUES (?, ?, ?, ?)",
+                         (self.key(operation_name, variables), json.dumps(response), now + ttl, now))
+            conn.execute("DELETE FROM lookups WHERE key IN (SELECT key FROM lookups ORDER BY used_at DESC "
+                         "LIMIT -1 OFFSET ?)", (self.max_size,))
+
+    def clear(self) -> None:
+        with self.connection as conn:
+            conn.execute("DELETE FROM lookups")
+
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+
+class MessageRecord:
+    __slots__ = ("id", "sent_at", "sent_ts", "channel_id", "sender_id", "display_name", "text", "stream_start",
+                 "stream_label")
+
+    def __init__(self, id_: str, sent_at: str, sent_ts: float, channel_id: str, sender_id: str, display_name: str,
+                 text: str, stream_start: float | None = None, stream_label: str | None = None) -> None:
+        self.id: str = id_
+        self.sent_at: str = sent_at
+        self.sent_ts: float = sent_ts
+        self.channel_id: str = channel_id
+        self.sender_id: str = sender_id
+        self.display_name: str = display_name
+        self.text: str = text
+        self.stream_start: float | None = stream_start
+        self.stream_label: str | None = stream_label
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row, stream_start: float | None = None,
+                 stream_label: str | None = None) -> "MessageRecord":
+        return cls(row["id"], row["sent_at"], row["sent_ts"], sys.intern(row["channel_id"]),
+                   sys.intern(row["sender_id"]), sys.intern(row["display_name"]), row["text"], stream_start,
+                   stream_label)
+
+    def key(self) -> tuple[float, str, str, str]:
+        return self.sent_ts, self.id, self.channel_id, self.sender_id
+
+
+class MessageColumns:
+    def __init__(self) -> None:
+        self.sent_ts: array = array("d")
+        self.stream_starts: array = array("d")
+        self.names: list[str | None] = [None]
+        self.name_ids: dict[str | None, int] = {None: 0}
+        self.fields: array = array("I")
+        self.blob: bytearray = bytearray()
+        self.offsets: array = array("Q", [0])
+
+    def __len__(self) -> int:
+        return len(self.sent_ts)
+
+    def __getitem__(self, i: int) -> MessageRecord:
+        channel, sender, display_name, stream_label = self.fields[i * 4:i * 4 + 4]
+        start, id_end, sent_at_end, text_end = self.offsets[i * 3:i * 3 + 4]
+        stream_start: float = self.stream_starts[i]
+
+        return MessageRecord(self.blob[start:id_end].decode(), self.blob[id_end:sent_at_end].decode(),
+                             self.sent_ts[i], self.names[channel], self.names[sender], self.names[display_name],
+                             self.blob[sent_at_end:text_end].decode(), None if isnan(stream_start) else stream_start,
+                             self.names[stream_label])
+
+    def __iter__(self) -> Iterator[MessageRecord]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def __reversed__(self) -> Iterator[MessageRecord]:
+        for i in range(len(self) - 1, -1, -1):
+            yield self[i]
+
+    def name_id(self, name: str | None) -> int:
+        i: int | None = self.name_ids.get(name)
+
+        if i is None:
+            i = self.name_ids[name] = len(self.names)
+            self.names.append(name)
+
+        return i
+
+    def append(self, record: MessageRecord) -> None:
+        self.sent_ts.append(record.sent_ts)
+        self.stream_starts.append(record.stream_start if record.stream_start is not None else float("nan"))
+        self.fields.extend((self.name_id(record.channel_id), self.name_id(record.sender_id),
+                            self.name_id(record.display_name), self.name_id(record.stream_label)))
+
+        for value in (record.id, record.sent_at, record.text):
+            self.blob += value.encode()
+            self.offsets.append(len(self.blob))
+
+    def clear(self) -> None:
+        del self.sent_ts[:]
+        del self.stream_starts[:]
+        del self.fields[:]
+        del self.offsets[1:]
+        self.blob.clear()
+
+
+class MessageFormatter:
+    cache_size: int = 4096
+
+    def __init__(self) -> None:
+        self.utc_minutes: dict[int, str] = {}
+        self.local_minutes: dict[int, str] = {}
+
+    def minute(self, minute: int) -> tuple[str, str]:
+        utc: str | None = self.utc_minutes.get(minute)
+        local: str | None = self.local_minutes.get(minute)
+
+        if utc is None or local is None:
+            if len(self.utc_minutes) >= self.cache_size:
+                self.utc_minutes.clear()
+                self.local_minutes.clear()
+
+            utc = self.utc_minutes[minute] = time.strftime("%d.%m.%Y %H:%M", time.gmtime(minute * 60))
+            local = self.local_minutes[minute] = time.strftime("%d.%m.%Y %H:%M", time.localtime(minute * 60))
+
+        return utc, local
+
+    def format(self, record: MessageRecord, with_timecodes: bool = False, prefixes: dict[str, str] | None = None,
+               local: bool = False) -> str:
+        minute, second = divmod(int(record.sent_ts), 60)
+        utc, local_time = self.minute(minute)
+
+        prefix: str = prefixes[record.channel_id] if prefixes is not None else ""
+
+        if record.stream_label is not None:
+            prefix += f"[{record.stream_label}] "
+
+        if record.stream_start is not None and with_timecodes:
+            hours, seconds = divmod(int(record.sent_ts - record.stream_start), 3600)
+            prefix += f"[{hours % 24:02d}:{seconds // 60:02d}:{seconds % 60:02d}] "
+
+        if local:
+            return f"{prefix}({local_time}:{second:02d}) {record.display_name}: {record.text}"
+
+        return f"{prefix}({utc}:{second:02d}) {record.display_name}: {record.text}\n"
+
+    def format_page(self, records: list[MessageRecord], with_timecodes: bool = False,
+                    prefixes: dict[str, str] | None = None, local: bool = False) -> list[str]:
+        return [self.format(record, with_timecodes, prefixes, local) for record in records]
+
+
+class StreamIndex:
+    def __init__(self, streams: list[tuple[str, int]]) -> None:
+        windows: list[tuple[float, int, int]] = sorted(
+            (MessageStore.parse_date(date).timestamp(), length, number)
+            for number, (date, length) in enumerate(streams, 1)
+        )
+
+        self.starts: list[float] = [start for start, _, _ in windows]
+        self.ends: list[float] = [start + length for start, length, _ in windows]
+        self.labels: list[str] = [f"#{number}" for _, _, number in windows]
+
+    @property
+    def start(self) -> float:
+        return self.starts[0]
+
+    @property
+    def end(self) -> float:
+        return max(self.ends)
+
+    def locate(self, timestamp: float) -> tuple[float, str] | None:
+        i: int = bisect_right(self.starts, timestamp) - 1
+
+        if i < 0 or timestamp > self.ends[i]:
+            return None
+
+        return self.starts[i], self.labels[i]
+
+
+class MessageExporter:
+    chunk_size: int = 10000
+    extension: str = "txt"
+
+    def __init__(self, name: str = "messages", directory: str = "messages", compress: bool = False,
+                 metrics: Metrics | None = None) -> None:
+        if not os.path.exists(directory) or not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        self.name: str = name
+        self.directory: str = directory
+        self.compress: bool = compress
+        self.metrics: Metrics | None = metrics
+        self.spill_dir: str | None = None
+        self.chunks: list[str] = []
+        self.buffer: MessageColumns = MessageColumns()
+        self.count: int = 0
+        self.formatter: MessageFormatter = MessageFormatter()
+        self.with_timecodes: bool = False
+        self.prefixes: dict[str, str] | None = None
+
+    def __enter__(self) -> "MessageExporter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    @staticmethod
+    def record(record: MessageRecord) -> dict:
+        return {
+            "id": record.id,
+            "sent_at": record.sent_at,
+            "channel_id": record.channel_id,
+            "sender_id": record.sender_id,
+            "display_name": record.display_name,
+            "text": record.text,
+            "stream": record.stream_label,
+            "timecode": int(record.sent_ts - record.stream_start) if record.stream_start is not None else None
+        }
+
+    def header(self) -> str:
+        return ""
+
+    def encode(self, records: Iterator[MessageRecord]) -> Iterator[str]:
+        for record in records:
+            yield self.formatter.format(record, self.with_timecodes, self.prefixes)
+
+    def write_page(self, records: list[MessageRecord], with_timecodes: bool = False,
+                   prefixes: dict[str, str] | None = None) -> None:
+        self.with_timecodes = with_timecodes
+        self.prefixes = prefixes
+
+        for record in records:
+            self.buffer.append(record)
+            self.count += 1
+
+            if len(self.buffer) >= self.chunk_size:
+                self._spill()
+
+    def append_page(self, records: list[MessageRecord], with_timecodes: bool = False,
+                    prefixes: dict[str, str] | None = None) -> str:
+        self.with_timecodes = with_timecodes
+        self.prefixes = prefixes
+
+        path: str = os.path.join(self.directory, f"{self.name}.{self.extension}{".gz" if self.compress else ""}")
+        created: bool = not os.path.exists(path)
+
+        with Timer(self.metrics, "export"), open(path, "ab") as raw, \
+                (gzip.open(raw, "wt", encoding="UTF-8") if self.compress
+                 else io.TextIOWrapper(raw, encoding="UTF-8")) as file:
+            if created:
+                file.write(self.header())
+
+            file.writelines(self.encode(reversed(records)))
+
+        return path
+
+    def _spill(self) -> None:
+        if self.spill_dir is None:
+            self.spill_dir = tempfile.mkdtemp(prefix=f"{self.name}-spill-")
+
+        path: str = os.path.join(self.spill_dir, f"{len(self.chunks)}.txt")
+
+        with open(path, "w", encoding="UTF-8") as file:
+            file.writelines(self.encode(reversed(self.buffer)))
+
+        self.chunks.append(path)
+        self.buffer.clear()
+
+    def _create(self) -> tuple[str, IO[bytes]]:
+        stamp: str = time.strftime("%Y%m%d-%H%M%S")
+        extension: str = f"{self.extension}.gz" if self.compress else self.extension
+        i: int = 0
+
+        while True:
+            path: str = os.path.join(self.directory, f"{self.name}-{stamp}{f"-{i}" if i != 0 else ""}.{extension}")
+
+            try:
+                return path, open(path, "xb")
+            except FileExistsError:
+                i += 1
+
+    def close(self) -> str | None:
+        with Timer(self.metrics, "export"):
+            return self._close()
+
+    def _close(self) -> str | None:
+        path: str | None = None
+
+        if self.count != 0:
+            path, raw = self._create()
+
+            with raw, (gzip.open(raw, "wt", encoding="UTF-8") if self.compress
+                       else io.TextIOWrapper(raw, encoding="UTF-8")) as file:
+                file.write(self.header())
+                file.writelines(self.encode(reversed(self.buffer)))
+
+                for chunk in reversed(self.chunks):
+                    with open(chunk, "r", encoding="UTF-8") as chunk_file:
+                        shutil.copyfileobj(chunk_file, file)
+
+        if self.spill_dir is not None:
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+            self.spill_dir = None
+
+        self.chunks.clear()
+        self.buffer.clear()
+
+        return path
+
+
+class JSONLExporter(MessageExporter):
+    extension: str = "jsonl"
+
+    def encode(self, records: Iterator[MessageRecord]) -> Iterator[str]:
+        for record in records:
+            yield json.dumps(self.record(record), ensure_ascii=False) + "\n"
+
+
+class CSVExporter(MessageExporter):
+    extension: str = "csv"
+    fields: list[str] = ["id", "sent_at", "channel_id", "sender_id", "display_name", "text", "stream", "timecode"]
+
+    def header(self) -> str:
+        return ",".join(self.fields) + "\n"
+
+    def encode(self, records: Iterator[MessageRecord]) -> Iterator[str]:
+        line: io.StringIO = io.StringIO()
+        writer: csv.DictWriter = csv.DictWriter(line, self.fields, lineterminator="\n")
+
+        for record in records:
+            writer.writerow(self.record(record))
+            yield line.getvalue()
+            line.seek(0)
+            line.truncate()
+
+
+EXPORTERS: dict[str, type[MessageExporter]] = {
+    "txt": MessageExporter,
+    "jsonl": JSONLExporter,
+    "csv": CSVExporter
+}
+
+
+class Job:
+    def __init__(self, id_: int, name: str, indeterminate: bool = False) -> None:
+        self.id: int = id_
+        self.name: str = name
+        self.indeterminate: bool = indeterminate
+        self.store_id: int | None = None
+        self.metrics: Metrics = Metrics()
+        self.cancelled: threading.Event = threading.Event()
+        self.done: threading.Event = threading.Event()
+        self.result: Any = None
+        self.error: Exception | None = None
+        self.progress: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def cancel(self) -> None:
+        self.cancelled.set()
+
+    def set_progress(self, key: str, value: float) -> None:
+        with self._lock:
+            self.progress[key] = value
+
+    def progress_items(self) -> list[tuple[str, float]]:
+        with self._lock:
+            return list(self.progress.items())
+
+    def total_progress(self) -> float:
+        with self._lock:
+            return sum(self.progress.values()) / len(self.progress) if self.progress else 0.0
+
+    def wait(self, timeout: float | None = None) -> bool:
+        return self.done.wait(timeout)
+
+
+current_job: contextvars.ContextVar[Job | None] = contextvars.ContextVar("current_job", default=None)
+
+
+class JobPool(ThreadPoolExecutor):
+    def __init__(self, max_workers: int | None = None, on_interrupt: Callable[[], None] | None = None) -> None:
+        super().__init__(max_workers=max_workers)
+
+        self.on_interrupt: Callable[[], None] | None = on_interrupt
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> bool:
+        if exc_type is KeyboardInterrupt and self.on_interrupt is not None:
+            self.on_interrupt()
+
+        return super().__exit__(exc_type, exc_val, exc_tb)
+
+    def submit(self, fn: Callable, /, *args, **kwargs) -> Future:
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+class JobManager:
+    def __init__(self, on_finish: Callable[[Job], None] | None = None) -> None:
+        self.on_finish: Callable[[Job], None] | None = on_finish
+        self.jobs: dict[int, Job] = {}
+        self.latest: Job | None = None
+        self._ids: Iterator[int] = count(1)
+        self._lock = threading.Lock()
+
+    def start(self, name: str, target: Callable[[Job], Any], indeterminate: bool = False) -> Job:
+        job: Job = Job(next(self._ids), name, indeterminate)
+
+        with self._lock:
+            self.jobs[job.id] = job
+            self.latest = job
+
+        threading.Thread(target=self._run, args=(job, target), name=f"job-{job.id}", daemon=True).start()
+
+        return job
+
+    def _run(self, job: Job, target: Callable[[Job], Any]) -> None:
+        current_job.set(job)
+
+        try:
+            job.result = target(job)
+        except Exception as e:
+            job.error = e
+        finally:
+            with self._lock:
+                self.jobs.pop(job.id, None)
+
+            job.done.set()
+
+            if self.on_finish is not None:
+                self.on_finish(job)
+
+    def active(self) -> list[Job]:
+        with self._lock:
+            return list(self.jobs.values())
+
+    def store_ids(self) -> set[int]:
+        return {job.store_id for job in self.active() if job.store_id is not None}
+
+    def cancel_all(self) -> None:
+        for job in self.active():
+            job.cancel()
+
+
+class ModLogPager:
+    def __init__(self, fetch: Callable[[str], dict | None], cursor: str = "", prefetch: int = 0,
+                 on_error: Callable[[Exception], None] | None = None) -> None:
+        self.fetch: Callable[[str], dict | None] = fetch
+        self.cursor: str = cursor
+        self.prefetch: int = prefetch
+        self.on_error: Callable[[Exception], None] | None = on_error
+        self.has_next: bool = True
+        self.failed: bool = False
+
+    def fail(self, error: Exception | None = None) -> None:
+        self.failed = True
+
+        if error is not None and self.on_error is not None:
+            self.on_error(error)
+
+    def _fetch_ahead(self, pages: queue.Queue, stopped: threading.Event) -> None:
+        def put(item: tuple | Exception | None) -> None:
+            while not stopped.is_set():
+                try:
+                    pages.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+
+        cursor: str = self.cursor
+        has_next: bool = True
+
+        try:
+            while has_next and not stopped.is_set():
+                messages: dict | None = self.fetch(cursor)
+
+                if messages is None:
+                    put(None)
+                    return
+
+                edges: list = messages["edges"]
+                has_next = messages["pageInfo"]["hasNextPage"] and bool(edges)
+
+                if edges:
+                    cursor = edges[-1]["cursor"]
+
+                put((edges, cursor, has_next))
+        except Exception as e:
+            put(e)
+
+    def pages(self) -> Iterator[list]:
+        if self.prefetch > 0:
+            yield from self._prefetched_pages()
+            return
+
+        while self.has_next:
+            try:
+                messages: dict | None = self.fetch(self.cursor)
+
+                if messages is None:
+                    self.fail()
+                    return
+
+                edges: list = messages["edges"]
+                self.has_next = messages["pageInfo"]["hasNextPage"] and bool(edges)
+            except Exception as e:
+                self.fail(e)
+                return
+
+            if edges:
+                self.cursor = edges[-1]["cursor"]
+
+            yield edges
+
+    def _prefetched_pages(self) -> Iterator[list]:
+        pages: queue.Queue = queue.Queue(maxsize=self.prefetch)
+        stopped: threading.Event = threading.Event()
+
+        threading.Thread(target=contextvars.copy_context().run, args=(self._fetch_ahead, pages, stopped),
+                         daemon=True).start()
+
+        try:
+            while self.has_next:
+                page: tuple | Exception | None = pages.get()
+
+                if not isinstance(page, tuple):
+                    self.fail(page)
+                    return
+
+                edges, self.cursor, self.has_next = page
+
+                yield edges
+        finally:
+            stopped.set()
+
+            while not pages.empty():
+                pages.get_nowait()
+
+
+
+class ModLogClient:
+    export_directory: str = "messages"
+    batch_size: int = 35
+    prefetch: int = 2
+    watch_min_interval: float = 5.0
+    watch_max_interval: float = 300.0
+
+    def __init__(self, config: Config | None = None) -> None:
+        self.config: Config = config if config is not None else Config()
+        self.jobs: JobManager = JobManager()
+        self._stop_flag: bool = False
+        self._job_id: int | None = None
+
+        self.session: GQLSession = GQLSession.from_settings(self.get_data().get("network", {}))
+
+        self.store: MessageStore = MessageStore()
+        self.lookups: LookupCache = LookupCache.from_settings(self.get_data().get("cache", {}))
+        self.formatter: MessageFormatter = MessageFormatter()
+        self._metrics: Metrics = Metrics()
+        self.metrics_path: str | None = self.get_data().get("metrics", {}).get("path")
+        self.view_sources: list[tuple] = []
+        self.export_format: str = self.get_data().get("export", {}).get("format", "txt")
+        self.export_gzip: bool = self.get_data().get("export", {}).get("gzip", False)
+        self.max_workers: int = self.get_data().get("network", {}).get("workers", 4)
+        self.scheduler: RequestScheduler = RequestScheduler.from_settings(self.get_data().get("network", {}))
+        self.batch_size = self.get_data().get("network", {}).get("batch_size", self.batch_size)
+        self.prefetch = self.get_data().get("network", {}).get("prefetch", self.prefetch)
+        self.watch_min_interval = self.get_data().get("watch", {}).get("min_interval", self.watch_min_interval)
+        self.watch_max_interval = self.get_data().get("watch", {}).get("max_interval", self.watch_max_interval)
+
+    @property
+    def stop_flag(self) -> bool:
+        job: Job | None = current_job.get()
+        return self._stop_flag or (job is not None and job.cancelled.is_set())
+
+    @stop_flag.setter
+    def stop_flag(self, value: bool) -> None:
+        self._stop_flag = value
+
+    def stop(self) -> None:
+        self.stop_flag = True
+
+    @property
+    def job_id(self) -> int | None:
+        job: Job | None = current_job.get()
+        return job.store_id if job is not None else self._job_id
+
+    @job_id.setter
+    def job_id(self, value: int | None) -> None:
+        job: Job | None = current_job.get()
+
+        if job is not None:
+            job.store_id = value
+        else:
+            self._job_id = value
+
+    @property
+    def metrics(self) -> Metrics:
+        job: Job | None = current_job.get()
+        return job.metrics if job is not None else self._metrics
+
+    def console_print(self, text: str, type_: Literal["error", "success"] = None) -> None:
+        print(text, file=sys.stderr if type_ == "error" else sys.stdout)
+
+    def console_write(self, text: str) -> None:
+        print(text)
+
+    def show_messages(self, display_messages: list[str]) -> None:
+        print("\n".join(display_messages))
+
+    def send_gql(self, headers: dict, payload: dict | list,
+                 priority: int = RequestScheduler.INTERACTIVE) -> rq.Response:
+        for _ in range(self.scheduler.retries):
+            with self.scheduler.slot(priority), self.metrics.timer("request"):
+                response: rq.Response = self.session.gql(headers, payload)
+
+            self.metrics.add(bytes_received=len(response.content))
+
+            if response.status_code != 429:
+                self.scheduler.success()
+                return response
+
+            self.metrics.add(throttled=1)
+            self.scheduler.throttle(self.scheduler.retry_after(response.headers.get("Retry-After")))
+
+        with self.scheduler.slot(priority), self.metrics.timer("request"):
+            return self.session.gql(headers, payload)
+
+    @staticmethod
+    def gql_payload(sha256hash: str, operation_name: str, variables: dict) -> dict:
+        return {
+            "extensions": {
+                "persistedQuery": {
+                    "sha256Hash": sha256hash,
+                    "version": 1
+                }
+            },
+            "operationName": operation_name,
+            "variables": variables
+        }
+
+    def check_response(self, json_: dict) -> bool:
+        if "error" in json_ or ("errors" in json_ and json_["errors"][0]["message"] == "failed integrity check"):
+            self.console_print("Failed integrity check! Auth data is probably out of date.", type_="error")
+            return False
+
+        if "errors" in json_:
+            self.console_print(f"Request failed: {json_['errors'][0]['message']}", type_="error")
+            return False
+
+        return True
+
+    def do_request(self, sha256hash: str, operation_name: str, variables: dict,
+                   priority: int = RequestScheduler.INTERACTIVE) -> dict | None:
+        return self.do_batch([(sha256hash, operation_name, variables)], priority)[0]
+
+    def do_batch(self, operations: list[tuple[str, str, dict]],
+                 priority: int = RequestScheduler.INTERACTIVE) -> list[dict | None]:
+        results: list[dict | None] = [None] * len(operations)
+
+        data: dict = self.get_data()
+        headers: dict = data["user_data"]
+
+        if headers == {}:
+            self.console_print("Auth data not found!", type_="error")
+            return results
+
+        try:
+            pending: list[int] = []
+
+            for i, (_, operation_name, variables) in enumerate(operations):
+                results[i] = self.lookups.get(operation_name, variables)
+
+                if results[i] is None:
+                    pending.append(i)
+
+            for start in range(0, len(pending), self.batch_size):
+                batch: list[int] = pending[start:start + self.batch_size]
+                payloads: list[dict] = [self.gql_payload(*operations[i]) for i in batch]
+                response: rq.Response = self.send_gql(headers, payloads if len(payloads) > 1 else payloads[0],
+                                                      priority)
+
+                if response.status_code == 429:
+                    self.console_print("Rate limited by Twitch! Try again later.", type_="error")
+                    return results
+
+                if response.status_code >= 500:
+                    self.console_print(f"Request failed with status {response.status_code}!", type_="error")
+                    return results
+
+                with self.metrics.timer("parse"):
+                    json_: dict | list = response.json()
+
+                if not response.ok or (isinstance(json_, dict) and len(batch) > 1):
+                    if not isinstance(json_, dict) or self.check_response(json_):
+                        self.console_print(f"Request failed with status {response.status_code}!", type_="error")
+
+                    return results
+
+                if isinstance(json_, dict):
+                    json_ = [json_]
+
+                for i, item in zip(batch, json_):
+                    if self.check_response(item):
+                        self.lookups.put(operations[i][1], operations[i][2], item)
+                        results[i] = item
+        except Exception as e:
+            self.console_print(f"An error occurred: {type(e)} ({str(e)})", type_="error")
+
+        return results
+
+    def get_ids_by_logins(self, logins: list[str]) -> dict[str, str | None | bool]:
+        sha256hash: str = "bf6c594605caa0c63522f690156aa04bd434870bf963deb76668c381d16fcaa5"
+        operation_name: str = "GetUserID"
+        ids: dict[str, str | None | bool] = {}
+
+        responses: list[dict | None] = self.do_batch([
+            (sha256hash, operation_name, {"login": login, "lookupType": "ACTIVE"}) for login in logins
+        ])
+
+        for login, response in zip(logins, responses):
+            if response is None:
+                ids[login] = False
+                continue
+
+            try:
+                user: dict | None = response["data"]["user"]
+
+                ids[login] = user["id"] if user else None
+            except Exception as e:
+                self.console_print(f"An error occurred: {type(e)} ({str(e)})", type_="error")
+                ids[login] = None
+
+        return ids
+
+    def get_id_by_login(self, login: str) -> str | None | bool:
+        return self.get_ids_by_logins([login])[login]
+
+    def resolve_senders(self, senders: list[str] | None = None) -> dict[str, str]:
+        if not senders:
+            user_id: list | None = self.get_data()["user_id"]
+            return {user_id[0]: user_id[1]} if user_id else {}
+
+        sender_ids: dict[str, str] = {}
+
+        for login, sender_id in self.get_ids_by_logins(senders).items():
+            if sender_id:
+                sender_ids[login] = sender_id
+            else:
+                self.console_write(f"User '{login}' not found!")
+
+        return sender_ids
+
+    def import_channels(self, logins: list[str]) -> tuple[dict[str, str], list[str]]:
+        def write_channels(data: dict) -> dict:
+            data["channels"].update(found)
+            return data
+
+        ids: dict[str, str | None | bool] = self.get_ids_by_logins(list(dict.fromkeys(logins)))
+        found: dict[str, str] = {login: user_id for login, user_id in ids.items() if user_id}
+
+        if found:
+            self.update_data(write_channels)
+
+        return found, [login for login, user_id in ids.items() if user_id is None]
+
+    def get_streams(self, count: int, channel: str) -> list[tuple[str, int]] | None:
+        sha256hash: str = "acea7539a293dfd30f0b0b81a263134bb5d9a7175592e14ac3f7c77b192de416"
+        operation_name: str = "FilterableVideoTower_Videos"
+        variables: dict = {
+            "broadcastType": "ARCHIVE",
+            "channelOwnerLogin": channel,
+            "limit": count,
+            "videoSort": "TIME"
+        }
+
+        response: dict | None = self.do_request(sha256hash, operation_name, variables)
+
+        if response is None:
+            return None
+
+        try:
+            edges: list = response["data"]["user"]["videos"]["edges"]
+            return [(edge["node"]["publishedAt"], edge["node"]["lengthSeconds"]) for edge in edges] or None
+        except Exception as e:
+            self.console_print(f"An error occurred: {type(e)} ({str(e)})", type_="error")
+            return None
+
+    @staticmethod
+    def mod_logs_operation(channel_id: str, sender_id: str, cursor: str = "") -> tuple[str, str, dict]:
+        sha256hash: str = "eaa9b16f4d95346050e99889df096a51ffa142e49d9e2ce1ae5fae39ac7a8076"
+        operation_name: str = "ViewerCardModLogsMessagesBySender"
+        variables: dict = {
+            "channelID": channel_id,
+            "cursor": cursor,
+            "senderID": sender_id
+        }
+
+        return sha256hash, operation_name, variables
+
+    def report_error(self, error: Exception) -> None:
+        self.console_print(f"An error occurred: {type(error)} ({str(error)})", type_="error")
+
+    def parse_mod_logs(self, response: dict | None) -> dict | None:
+        if response is None:
+            return None
+
+        try:
+            messages: dict = response["data"]["logs"]["messages"]
+            self.metrics.add(pages=1)
+            return messages
+        except Exception as e:
+            self.console_print(f"An error occurred: {type(e)} ({str(e)})", type_="error")
+            return None
+
+    def fetch_mod_logs(self, channel_id: str, sender_id: str, cursor: str = "") -> dict | None:
+        return self.parse_mod_logs(self.do_request(*self.mod_logs_operation(channel_id, sender_id, cursor),
+                                                   RequestScheduler.BULK))
+
+    def fetch_head(self, channel_id: str, sender_id: str,
+                   first_page: dict | None = None) -> tuple[list, str, bool] | None:
+        def fetch(cursor: str) -> dict | None:
+            if cursor == "" and first_page is not None:
+                return first_page
+
+            return self.fetch_mod_logs(channel_id, sender_id, cursor)
+
+        head: list = []
+        pager: ModLogPager = ModLogPager(fetch, on_error=self.report_error)
+        reached_known: bool = False
+
+        for edges in pager.pages():
+            if self.stop_flag:
+                return None
+
+            known: set[str] = self.store.known_ids(channel_id, sender_id, [edge["node"]["id"] for edge in edges])
+
+            for edge in edges:
+                if edge["node"]["id"] in known:
+                    reached_known = True
+                    break
+
+                head.append(edge)
+
+            if reached_known:
+                break
+
+        if pager.failed:
+            return None
+
+        return head, pager.cursor, reached_known
+
+    def store_head(self, channel_id: str, sender_id: str, head: list, cursor: str, reached_known: bool,
+                   synced_at: float) -> None:
+        with self.metrics.timer("store"):
+            if reached_known:
+                self.store.add_edges(channel_id, sender_id, head, synced_at)
+            else:
+                self.store.add_page(channel_id, sender_id, head, cursor, True, synced_at)
+
+            self.store.checkpoint_job(self.job_id)
+
+    def sync_messages(self, channel_id: str, sender_id: str, enough: Callable[[], bool] | None = None,
+                      progress: Callable[[], None] | None = None, until: float | None = None) -> bool:
+        def fetch(cursor: str) -> dict | None:
+            return self.fetch_mod_logs(channel_id, sender_id, cursor)
+
+        synced_at: float = time.time()
+        cursor, complete, last_synced_at = self.store.get_state(channel_id, sender_id)
+
+        if self.store.count(channel_id, sender_id) == 0:
+            self.store.set_state(channel_id, sender_id, "", False, synced_at)
+        elif until is None or last_synced_at is None or until > last_synced_at:
+            walked: tuple[list, str, bool] | None = self.fetch_head(channel_id, sender_id)
+
+            if walked is None:
+                return False
+
+            self.store_head(channel_id, sender_id, *walked, synced_at)
+
+        cursor, complete, _ = self.store.get_state(channel_id, sender_id)
+
+        if complete or (enough is not None and enough()):
+            return True
+
+        pager: ModLogPager = ModLogPager(fetch, cursor, self.prefetch, self.report_error)
+
+        for edges in pager.pages():
+            with self.metrics.timer("store"):
+                self.store.add_page(channel_id, sender_id, edges, pager.cursor, not pager.has_next)
+                self.store.checkpoint_job(self.job_id)
+
+            if progress is not None:
+                progress()
+
+            if self.stop_flag:
+                return False
+
+            if enough is not None and enough():
+                break
+
+        return not pager.failed
+
+    def sync_pair(self, channel_id: str, sender_id: str, max_messages: int = 0,
+                  streams: list[tuple[str, int]] | None = None, annotate: bool = False,
+                  progress: Callable[[float], None] | None = None) -> Callable[..., Iterator[MessageRecord]] | None:
+        def source(before: tuple[float, str, str, str] | None = None) -> Iterator[MessageRecord]:
+            for row in self.store.messages(channel_id, sender_id, limit=max_messages, since=stream_start,
+                                           until=stream_end, before=before):
+                if not annotate:
+                    yield MessageRecord.from_row(row, stream_start)
+                    continue
+
+                stream: tuple[float, str] | None = stream_index.locate(row["sent_ts"])
+
+                if stream is None:
+                    yield MessageRecord.from_row(row, None, "off-stream")
+                else:
+                    yield MessageRecord.from_row(row, *stream)
+
+        def enough() -> bool:
+            if max_messages != 0:
+                return self.store.count(channel_id, sender_id) >= max_messages
+
+            oldest: float | None = self.store.oldest(channel_id, sender_id)
+            return oldest is not None and oldest < stream_start
+
+        def on_page() -> None:
+            if progress is None:
+                return
+
+            if max_messages != 0:
+                progress(min(self.store.count(channel_id, sender_id) / max_messages, 1))
+            elif streams is not None:
+                window: float = (stream_end or synced_at) - stream_start
+                oldest: float | None = self.store.oldest(channel_id, sender_id)
+
+                if oldest is None or window <= 0:
+                    return
+
+                progress(max(window - max(oldest - stream_start, 0), 0) / window)
+
+        stream_start: float | None = None
+        stream_end: float | None = None
+        synced_at: float = time.time()
+
+        if streams:
+            stream_index: StreamIndex = StreamIndex(streams)
+
+            stream_start = stream_index.start
+            stream_end = None if annotate else stream_index.end
+
+        limited: bool = max_messages != 0 or streams is not None
+
+        if not self.sync_messages(channel_id, sender_id, enough if limited else None, on_page, stream_end) \
+                and not self.stop_flag:
+            return None
+
+        return source
+
+    def search_messages(self, text: str, limit: int = 1000) -> list[MessageRecord]:
+        words: list[str] = []
+        filters: dict = {}
+        channels: dict = self.get_data()["channels"]
+
+        for token in text.split():
+            key, _, value = token.partition(":")
+
+            if not value or key not in ["from", "in", "since", "until"]:
+                words.append(token)
+            elif key == "from":
+                filters["display_name"] = value
+            elif key == "in":
+                filters["channel_id"] = channels.get(value, value)
+            else:
+                day: float = datetime.strptime(value, "%d.%m.%Y").timestamp()
+                filters[key] = day if key == "since" else day + 24 * 3600
+
+        return [MessageRecord.from_row(row) for row in self.store.search(words, limit=limit, **filters)]
+
+    def open_exporter(self, name: str) -> MessageExporter:
+        return EXPORTERS[self.export_format](name, self.export_directory, self.export_gzip, self.metrics)
+
+    def render_messages(self, source: Callable[..., Iterator[MessageRecord]], with_timecodes: bool = False,
+                        prefixes: dict[str, str] | None = None, exporter: MessageExporter | None = None) -> int:
+        messages_count: int = 0
+        records: Iterator[MessageRecord] = source()
+
+        self.view_sources.append((source, with_timecodes, prefixes))
+
+        while not self.stop_flag or exporter is not None:
+            with self.metrics.timer("load"):
+                page: list[MessageRecord] = list(islice(records, 100))
+
+            if not page:
+                break
+
+            if exporter is not None:
+                with self.metrics.timer("export"):
+                    exporter.write_page(page, with_timecodes, prefixes)
+
+            messages_count += len(page)
+            self.metrics.add(messages=len(page))
+
+            if self.stop_flag:
+                continue
+
+            with self.metrics.timer("transform"):
+                display_messages: list[str] = self.formatter.format_page(page, with_timecodes, prefixes, local=True)
+
+            with self.metrics.timer("render"):
+                self.show_messages(display_messages)
+
+        return messages_count
+
+    def export_channel(self, channel: str, channel_id: str, sender_id: str, max_messages: int = 0,
+                       streams_ago: int = 0, with_timecodes: bool = False,
+                       progress: Callable[[float], None] | None = None, prefixes: dict[str, str] | None = None,
+                       save_as: str | None = None, annotate: bool = False) -> int | None:
+        streams: list[tuple[str, int]] | None = None
+
+        if streams_ago != 0:
+            streams = self.get_streams(streams_ago, channel)
+
+            if streams is None:
+                self.console_write(f"[{channel}] Stream not found!")
+                return None
+
+            if not annotate:
+                streams = streams[-1:]
+
+        source: Callable[..., Iterator[MessageRecord]] | None = self.sync_pair(channel_id, sender_id, max_messages,
+                                                                      streams, annotate, progress)
+
+        if source is None:
+            return None
+
+        if save_as is None:
+            return self.render_messages(source, with_timecodes, prefixes)
+
+        with self.open_exporter(save_as) as exporter:
+            return self.render_messages(source, with_timecodes, prefixes, exporter)
+
+    def export_senders(self, pool: JobPool, channels: dict, senders: list[str], max_messages: int = 0,
+                       streams_ago: int = 0, with_timecodes: bool = False,
+                       set_progress: Callable[[str, float], None] | None = None,
+                       save_as: str | None = None, annotate: bool = False) -> int | None:
+        sender_ids: dict[str, str] = self.resolve_senders(senders)
+        streams: dict[str, list | None] = dict.fromkeys(channels)
+
+        if streams_ago != 0:
+            for channel, channel_streams in zip(channels, pool.map(partial(self.get_streams, streams_ago), channels)):
+                if channel_streams is None:
+                    self.console_write(f"[{channel}] Stream not found!")
+
+                streams[channel] = channel_streams if annotate or channel_streams is None else channel_streams[-1:]
+
+        futures: dict = {}
+
+        for channel, channel_id in channels.items():
+            if streams_ago != 0 and streams[channel] is None:
+                continue
+
+            for login, sender_id in sender_ids.items():
+                key: str = f"{channel}/{login}"
+                futures[pool.submit(self.sync_pair, channel_id, sender_id, max_messages, streams[channel], annotate,
+                                    partial(set_progress, key) if set_progress else None)] = key
+
+        sources: list = []
+
+        for future in as_completed(futures):
+            try:
+                source: Callable[..., Iterator[MessageRecord]] | None = future.result()
+            except Exception as e:
+                self.console_print(f"[{futures[future]}] An error occurred: {type(e)} ({str(e)})", type_="error")
+                source = None
+
+            if set_progress is not None:
+                set_progress(futures[future], 1)
+
+            if source is None:
+                self.console_write(f"[{futures[future]}] Failed")
+                continue
+
+            sources.append(source)
+
+        if self.stop_flag and save_as is None:
+            return None
+
+        prefixes: dict[str, str] | None = None
+
+        if len(channels) > 1:
+            prefixes = {channel_id: f"[{channel}] " for channel, channel_id in channels.items()}
+
+        def merged(before: tuple[float, str, str, str] | None = None) -> Iterator[MessageRecord]:
+            return heapq.merge(*(source(before) for source in sources), key=MessageRecord.key, reverse=True)
+
+        if save_as is None:
+            return self.render_messages(merged, with_timecodes, prefixes)
+
+        with self.open_exporter(save_as) as exporter:
+            return self.render_messages(merged, with_timecodes, prefixes, exporter)
+
+    def run_export(self, channels: dict, sender_id: str | None, max_messages: int = 0, streams_ago: int = 0,
+                   senders: list[str] | None = None, annotate: bool = False, with_timecodes: bool = False,
+                   save_messages: bool = False, set_progress: Callable[[str, float], None] | None = None,
+                   job_id: int | None = None) -> None:
+        params: dict = {
+            "channels": channels,
+            "sender_id": sender_id,
+            "max_messages": max_messages,
+            "streams_ago": streams_ago,
+            "senders": senders,
+            "annotate": annotate,
+            "with_timecodes": with_timecodes,
+            "save_messages": save_messages
+        }
+        messages_count: int | None = None
+
+        self.metrics.reset()
+        self.job_id = self.store.start_job(params, job_id)
+
+        try:
+            messages_count = self._run_export(channels, sender_id, max_messages, streams_ago, senders, annotate,
+                                              with_timecodes, save_messages, set_progress)
+        except KeyboardInterrupt:
+            self.stop()
+            raise
+        finally:
+            if self.stop_flag:
+                status: Literal["done", "stopped", "failed"] = "stopped"
+            else:
+                status = "done" if messages_count is not None else "failed"
+
+            self.store.finish_job(self.job_id, status, messages_count or 0)
+            self.job_id = None
+            self.metrics.finish()
+
+            if self.metrics_path is not None:
+                self.metrics.dump(self.metrics_path)
+
+    def _run_export(self, channels: dict, sender_id: str | None, max_messages: int = 0, streams_ago: int = 0,
+                    senders: list[str] | None = None, annotate: bool = False, with_timecodes: bool = False,
+                    save_messages: bool = False,
+                    set_progress: Callable[[str, float], None] | None = None) -> int | None:
+        if senders:
+            with JobPool(max_workers=self.max_workers, on_interrupt=self.stop) as pool:
+                return self.export_senders(pool, channels, senders, max_messages, streams_ago, with_timecodes,
+                                           set_progress, "batch" if save_messages else None, annotate)
+        elif len(channels) == 1:
+            channel, channel_id = next(iter(channels.items()))
+            return self.export_channel(channel, channel_id, sender_id, max_messages, streams_ago, with_timecodes,
+                                       partial(set_progress, channel) if set_progress else None,
+                                       save_as="messages" if save_messages else None, annotate=annotate)
+        else:
+            total: int | None = 0
+
+            with JobPool(max_workers=min(self.max_workers, len(channels)), on_interrupt=self.stop) as pool:
+                futures: dict = {
+                    pool.submit(self.export_channel, channel, channel_id, sender_id, max_messages, streams_ago,
+                                with_timecodes, partial(set_progress, channel) if set_progress else None,
+                                {channel_id: f"[{channel}] "}, channel if save_messages else None, annotate): channel
+                    for channel, channel_id in channels.items()
+                }
+
+                for future in as_completed(futures):
+                    channel: str = futures[future]
+
+                    try:
+                        messages_count: int | None = future.result()
+                    except Exception as e:
+                        self.console_print(f"[{channel}] An error occurred: {type(e)} ({str(e)})", type_="error")
+                        messages_count = None
+
+                    if set_progress is not None:
+                        set_progress(channel, 1)
+
+                    if messages_count is None:
+                        self.console_write(f"[{channel}] Failed")
+                        total = None
+                        continue
+
+                    if total is not None:
+                        total += messages_count
+
+                    self.console_write(f"[{channel}] Done, {messages_count} messages")
+
+            return total
+
+    def resume_job(self, set_progress: Callable[[str, float], None] | None = None) -> bool:
+        job: tuple[int, dict, str, int] | None = self.store.last_job(self.jobs.store_ids())
+
+        if job is None:
+            return False
+
+        job_id, params, status, pages = job
+        self.console_write(f"Resuming {status} job #{job_id} ({pages} pages already fetched)")
+        self.run_export(**params, set_progress=set_progress, job_id=job_id)
+
+        return True
+
+    def poll_messages(self, pairs: list[tuple[str, str]], fresh: set[tuple[str, str]]) -> list[MessageRecord] | None:
+        operations: list[tuple[str, str, dict]] = [self.mod_logs_operation(*pair) for pair in pairs]
+        pages: list[dict | None] = [self.parse_mod_logs(response)
+                                    for response in self.do_batch(operations, RequestScheduler.BULK)]
+        records: list[MessageRecord] = []
+        synced_at: float = time.time()
+
+        if all(page is None for page in pages):
+            return None
+
+        for (channel_id, sender_id), page in zip(pairs, pages):
+            if page is None or self.stop_flag:
+                continue
+
+            if (channel_id, sender_id) in fresh:
+                edges: list = page["edges"]
+                fresh.discard((channel_id, sender_id))
+
+                with self.metrics.timer("store"):
+                    self.store.add_page(channel_id, sender_id, edges, edges[-1]["cursor"] if edges else "",
+                                        not (page["pageInfo"]["hasNextPage"] and edges), synced_at)
+                continue
+
+            walked: tuple[list, str, bool] | None = self.fetch_head(channel_id, sender_id, page)
+
+            if walked is None or not walked[0]:
+                continue
+
+            self.store_head(channel_id, sender_id, *walked, synced_at)
+            records.extend(MessageRecord.from_row(row)
+                           for row in self.store.messages(channel_id, sender_id, limit=len(walked[0])))
+
+        return records
+
+    def watch(self, channels: dict, sender_ids: dict[str, str], save_messages: bool = False) -> None:
+        pairs: list[tuple[str, str]] = [(channel_id, sender_id) for channel_id in channels.values()
+                                        for sender_id in sender_ids.values()]
+        fresh: set[tuple[str, str]] = {pair for pair in pairs if self.store.count(*pair) == 0}
+        prefixes: dict[str, str] | None = None
+        exporter: MessageExporter | None = self.open_exporter("watch") if save_messages else None
+        interval: float = self.watch_min_interval
+
+        if len(channels) > 1:
+            prefixes = {channel_id: f"[{channel}] " for channel, channel_id in channels.items()}
+
+        self.metrics.reset()
+        self.console_write(f"Watching {len(pairs)} channel/sender pairs...")
+
+        try:
+            while not self.stop_flag:
+                records: list[MessageRecord] | None = self.poll_messages(pairs, fresh)
+
+                if records:
+                    records.sort(key=lambda record: record.sent_ts, reverse=True)
+                    self.metrics.add(messages=len(records))
+
+                    if exporter is not None:
+                        exporter.append_page(records, prefixes=prefixes)
+
+                    self.show_messages(self.formatter.format_page(records, prefixes=prefixes, local=True))
+                    interval = self.watch_min_interval
+                else:
+                    interval = min(interval * 2, self.watch_max_interval)
+
+                deadline: float = time.monotonic() + interval
+
+                while not self.stop_flag and time.monotonic() < deadline:
+                    time.sleep(min(0.5, max(deadline - time.monotonic(), 0)))
+        finally:
+            if exporter is not None:
+                exporter.close()
+
+            self.metrics.finish()
+
+            if self.metrics_path is not None:
+                self.metrics.dump(self.metrics_path)
+
+    def analytics(self, channels: dict, sender_ids: dict[str, str], streams_ago: int = 0) -> dict:
+        report: dict = {"generated_at": time.time(), "channels": {}, "pairs": []}
+
+        for channel, channel_id in channels.items():
+            streams: list[tuple[str, int]] | None = self.get_streams(streams_ago, channel) if streams_ago else None
+            report["channels"][channel] = 0
+
+            for login, sender_id in sender_ids.items():
+                totals: sqlite3.Row | None = self.store.totals(channel_id, sender_id)
+
+                if totals is None:
+                    continue
+
+                pair: dict = {
+                    "channel": channel,
+                    "sender": login,
+                    "display_name": totals["display_name"],
+                    "messages": totals["count"],
+                    "first_seen": totals["first_ts"],
+                    "last_seen": totals["last_ts"],
+                    "hours": self.store.hours(channel_id, sender_id),
+                    "timeline": self.store.timeline(channel_id, sender_id),
+                    "streams": []
+                }
+
+                if streams:
+                    stream_index: StreamIndex = StreamIndex(streams)
+
+                    for start, end, label in zip(stream_index.starts, stream_index.ends, stream_index.labels):
+                        pair["streams"].append({"stream": label, "started_at": start,
+                                                "messages": self.store.count(channel_id, sender_id, start, end)})
+
+                report["channels"][channel] += totals["count"]
+                report["pairs"].append(pair)
+
+        return report
+
+    @staticmethod
+    def analytics_lines(report: dict) -> list[str]:
+        def date(timestamp: float) -> str:
+            return time.strftime("%d.%m.%Y %H:%M", time.localtime(timestamp))
+
+        lines: list[str] = [f"{channel}: {count} messages" for channel, count in report["channels"].items()]
+
+        for pair in report["pairs"]:
+            lines.extend([
+                "",
+                f"[{pair['channel']}] {pair['display_name']}: {pair['messages']} messages",
+                f"First seen: {date(pair['first_seen'])}",
+                f"Last seen: {date(pair['last_seen'])}"
+            ])
+
+            if pair["timeline"]:
+                minute, peak = max(pair["timeline"], key=lambda bucket: bucket[1])
+                lines.append(f"Active minutes: {len(pair['timeline'])}, peak {peak}/min at {date(minute)}")
+
+            lines.append("Hours: " + " ".join(f"{hour}:{count}" for hour, count in pair["hours"].items()))
+            lines.extend(f"Stream {stream['stream']} ({date(stream['started_at'])}): {stream['messages']} messages"
+                         for stream in reversed(pair["streams"]))
+
+        return lines
+
+    def export_analytics(self, report: dict, name: str = "analytics") -> str:
+        if not os.path.exists(self.export_directory) or not os.path.isdir(self.export_directory):
+            os.makedirs(self.export_directory)
+
+        path: str = os.path.join(self.export_directory, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+
+        with open(path, "w", encoding="UTF-8") as file:
+            json.dump(report, file, indent=4, ensure_ascii=False)
+
+        return path
+
+    def get_data(self) -> dict:
+        return self.config.get()
+
+    def update_data(self, update: Callable) -> None:
+        self.config.update(update)
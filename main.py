@@ -1,42 +1,172 @@
-import json
+import heapq
 import os
-import sys
-import re
 import queue
+import re
+import sys
 import threading
 import time
 
 import customtkinter as ctk
-import requests as rq
-from datetime import datetime, timedelta
+from core import Job, MessageRecord, Metrics, ModLogClient, Timer, current_job
+from itertools import islice
+from tkinter.filedialog import askopenfilename
 from tkinter.messagebox import showerror, showinfo
-from CTkListbox import CTkListbox
-from typing import Callable, Literal
+from typing import Callable, Iterator, Literal
+
+
+class ConsoleRenderer:
+    def __init__(self, console: ctk.CTkTextbox | None = None, max_lines: int = 5000, max_pending: int = 64,
+                 metrics: Metrics | None = None) -> None:
+        self.console: ctk.CTkTextbox | None = console
+        self.metrics: Metrics | None = metrics
+        self.max_lines: int = max_lines
+        self.max_pending: int = max_pending
+
+        self.pending: list[tuple[str, str | None, bool]] = []
+        self.condition = threading.Condition()
+
+    def write(self, text: str, type_: Literal["error", "success"] | None = None, block: bool = True,
+              notify: bool = False) -> None:
+        with self.condition:
+            if block and len(self.pending) >= self.max_pending:
+                job: Job | None = current_job.get()
+
+                with Timer() as timer:
+                    while len(self.pending) >= self.max_pending and not (job is not None and job.cancelled.is_set()):
+                        self.condition.wait(0.1)
+
+                metrics: Metrics | None = job.metrics if job is not None else self.metrics
+
+                if metrics is not None:
+                    metrics.add(ui_blocked=timer.elapsed)
+
+            self.pending.append((text, type_, notify))
+
+    def bind(self, console: ctk.CTkTextbox) -> None:
+        self.console = console
+
+    def flush(self) -> None:
+        if not self.pending:
+            return
 
+        with Timer(self.metrics, "flush"):
+            self._flush()
 
-class Timer:
-    def __enter__(self):
-        self.start = time.perf_counter()
-        return self
+    def _flush(self) -> None:
+        with self.condition:
+            pending: list[tuple[str, str | None, bool]] = self.pending
+            self.pending = []
+            self.condition.notify_all()
 
-    def __exit__(self, *args):
-        self.end = time.perf_counter()
-        self.elapsed = self.end - self.start
-        print(f"{self.elapsed:.6f} сек")
+        if self.console is None or not self.console.winfo_exists():
+            for text, type_, notify in pending:
+                if not notify:
+                    continue
+
+                if type_ == "error":
+                    showerror("Error", text)
+                else:
+                    showinfo("Info", text)
+
+            return
+
+        groups: list[list] = []
+
+        for text, type_, _ in pending:
+            if groups and groups[-1][0] == type_:
+                groups[-1][1].append(text)
+            else:
+                groups.append([type_, [text]])
+
+        self.console.configure(state=ctk.NORMAL)
+
+        for type_, texts in groups:
+            self.console.insert("1.0", "\n".join(reversed(texts)) + "\n", type_)
+
+        lines_count: int = int(self.console.index("end-1c").split(".")[0])
+
+        if lines_count > self.max_lines:
+            self.console.delete(f"{self.max_lines + 1}.0", ctk.END)
+
+        self.console.configure(state=ctk.DISABLED)
+        self.console.see("1.0")
+
+    def replace(self, text: str) -> None:
+        self.console.configure(state=ctk.NORMAL)
+        self.console.delete("1.0", ctk.END)
+        self.console.insert("1.0", text + "\n")
+        self.console.configure(state=ctk.DISABLED)
+        self.console.see("1.0")
+
+
+class UIDispatcher:
+    def __init__(self, root: ctk.CTk, interval: int = 50, max_calls: int = 500) -> None:
+        self.root: ctk.CTk = root
+        self.interval: int = interval
+        self.max_calls: int = max_calls
+        self.calls: queue.SimpleQueue = queue.SimpleQueue()
+        self.hooks: list[Callable[[], None]] = []
+
+    def post(self, callback: Callable, *args) -> None:
+        self.calls.put((callback, args))
+
+    def start(self) -> None:
+        self.root.after(self.interval, self._tick)
+
+    def _tick(self) -> None:
+        try:
+            for _ in range(self.max_calls):
+                try:
+                    callback, args = self.calls.get_nowait()
+                except queue.Empty:
+                    break
+
+                callback(*args)
+
+            for hook in self.hooks:
+                hook()
+        finally:
+            self.root.after(self.interval, self._tick)
+
+
+class GuiClient(ModLogClient):
+    def __init__(self, app: "GetMessages") -> None:
+        super().__init__()
+
+        self.app: GetMessages = app
+
+    def console_print(self, text: str, type_: Literal["error", "success"] = None) -> None:
+        self.app.console_print(text, type_)
+
+    def console_write(self, text: str) -> None:
+        self.app.console_write(text)
+
+    def show_messages(self, display_messages: list[str]) -> None:
+        self.app.show_messages(display_messages)
 
 
 class GetMessages(ctk.CTk):
     def __init__(self) -> None:
         super().__init__()
 
+        self.renderer: ConsoleRenderer = ConsoleRenderer()
+        self.client: GuiClient = GuiClient(self)
+        self.renderer.metrics = self.client.metrics
+        self.renderer.max_lines = self.client.get_data().get("console", {}).get("max_lines", 5000)
+
         self.console: ctk.CTkTextbox | None = None
         self.confirm_button: ctk.CTkButton | None = None
         self.loading_bar: ctk.CTkProgressBar | None = None
-        self.in_process_flag: bool = False
-        self.stop_flag: bool = False
+        self.progress_label: ctk.CTkLabel | None = None
+        self.search_job: Job | None = None
+        self.progress_mode: str = "determinate"
+
+        self.dispatcher: UIDispatcher = UIDispatcher(self)
+        self.dispatcher.hooks.append(self.refresh_ui)
+        self.client.jobs.on_finish = lambda job: self.dispatcher.post(self.on_job_finished, job)
 
-        self.msg_queue: "queue.Queue[tuple]" = queue.Queue()
-        threading.Thread(target=self._process_messages_queue, daemon=True).start()
+        self.view_page: int = 0
+        self.view_bounds: list[tuple[float, str, str, str] | None] = [None]
 
         self.widgets: list = []
 
@@ -44,10 +174,12 @@ class GetMessages(ctk.CTk):
         self.selected_mode = ctk.StringVar(value="Select mode")
         self.messages_count: str = ""
         self.streams_ago: str = ""
+        self.senders: str = ""
         self.with_timecodes = ctk.BooleanVar(value=False)
         self.save_messages_in_file = ctk.BooleanVar(value=False)
 
         self.init_main_menu()
+        self.dispatcher.start()
 
     def clear_window(self) -> None:
         for widget in self.winfo_children():
@@ -57,27 +189,27 @@ class GetMessages(ctk.CTk):
         def on_confirm() -> None:
             selected_mode: str = self.selected_mode.get()
             selected_channel: str = self.selected_channel.get()
-            data: dict = self.get_data()
+            data: dict = self.client.get_data()
+            senders: list[str] = [login for login in re.split(r"[,\s]+", self.senders.lower()) if login]
 
             if selected_mode == "Select mode":
                 self.console_print("Mode not selected!", type_="error")
-                stop()
                 return
 
             if selected_channel == "Select channel":
                 self.console_print("Channel not selected!", type_="error")
-                stop()
                 return
 
-            if data["user_id"] is None:
+            if data["user_id"] is None and not senders:
                 self.console_print("User id not found!", type_="error")
-                stop()
+                return
+
+            if selected_channel == "All channels" and data["channels"] == {}:
+                self.console_print("No channels added!", type_="error")
                 return
 
             if selected_mode == "All messages":
-                self.loading_bar.configure(mode="indeterminate")
-                self.loading_bar.start()
-                threading.Thread(target=self.get_messages).start()
+                self.get_messages(senders=senders)
             elif selected_mode == "Last ... messages":
                 try:
                     messages_count: int = int(self.messages_count)
@@ -85,20 +217,62 @@ class GetMessages(ctk.CTk):
                         self.console_print("Invalid messages count!", type_="error")
                         return
 
-                    threading.Thread(target=self.get_messages, kwargs={"max_messages": messages_count}).start()
+                    self.get_messages(max_messages=messages_count, senders=senders)
                 except ValueError:
                     self.console_print("Invalid messages count!", type_="error")
-            elif selected_mode == "From ... stream":
+            elif selected_mode in ["From ... stream", "Annotate ... streams"]:
                 try:
-                    last_stream: tuple = self.get_stream_ago(int(self.streams_ago))
-                    if last_stream is not None:
-                        threading.Thread(target=self.get_messages, kwargs={"last_stream": last_stream}).start()
+                    streams_ago: int = int(self.streams_ago)
+                    if streams_ago <= 0:
+                        self.console_print("Invalid streams ago!", type_="error")
+                        return
+
+                    self.get_messages(streams_ago=streams_ago, senders=senders,
+                                      annotate=selected_mode == "Annotate ... streams")
                 except ValueError:
                     self.console_print("Invalid streams ago!", type_="error")
+            elif selected_mode == "Watch new messages":
+                self.get_messages(senders=senders, watch=True)
 
-        def stop() -> None:
-            if self.in_process_flag:
-                self.stop_flag = True
+        def on_resume() -> None:
+            self.get_messages(resume=True)
+
+        def search(_=None) -> None:
+            def run(job: Job) -> None:
+                try:
+                    records: list[MessageRecord] = self.client.search_messages(text, self.renderer.max_lines)
+                except ValueError:
+                    self.console_print("Invalid date! Use dd.mm.yyyy format.", type_="error")
+                    return
+
+                channel_names: dict[str, str] = {channel_id: channel for channel, channel_id in channels.items()}
+                prefixes: dict[str, str] = {
+                    record.channel_id: f"[{channel_names.get(record.channel_id, record.channel_id)}] "
+                    for record in records
+                }
+                display_messages: list[str] = self.client.formatter.format_page(records, prefixes=prefixes,
+                                                                                local=True)
+
+                self.dispatcher.post(show, job, display_messages)
+
+            def show(job: Job, display_messages: list[str]) -> None:
+                if job is not self.search_job:
+                    return
+
+                self.client.view_sources = []
+                self.view_page = 0
+                self.view_bounds = [None]
+                self.renderer.replace("\n".join(display_messages) if display_messages else "Nothing found!")
+
+            text: str = search_entry.get()
+
+            if not text.strip():
+                return
+
+            if self.search_job is not None:
+                self.search_job.cancel()
+
+            self.search_job = self.client.jobs.start("Search", run, indeterminate=True)
 
         def on_change_option(_=None) -> None:
             def update_messages_count(_) -> None:
@@ -107,6 +281,9 @@ class GetMessages(ctk.CTk):
             def update_streams_ago(_) -> None:
                 self.streams_ago = streams_ago.get()
 
+            def update_senders(_) -> None:
+                self.senders = senders.get()
+
             option: str = self.selected_mode.get()
 
             for widget in self.widgets:
@@ -125,7 +302,7 @@ class GetMessages(ctk.CTk):
 
                 self.widgets.append(messages_count)
 
-            if option == "From ... stream":
+            if option in ["From ... stream", "Annotate ... streams"]:
                 streams_ago = ctk.CTkEntry(left_side, placeholder_text="... streams ago")
                 streams_ago.pack(pady=(10, 0))
                 streams_ago.bind("<KeyRelease>", update_streams_ago)
@@ -135,14 +312,24 @@ class GetMessages(ctk.CTk):
 
                 self.widgets.append(streams_ago)
 
-            if option in ["Last ... messages", "From ... stream", "All messages"]:
+            if option in ["Last ... messages", "From ... stream", "Annotate ... streams", "All messages",
+                          "Watch new messages"]:
+                senders = ctk.CTkEntry(left_side, placeholder_text="Senders (optional)")
+                senders.pack(pady=(10, 0))
+                senders.bind("<KeyRelease>", update_senders)
+
+                if self.senders != "":
+                    senders.insert(0, self.senders)
+
+                self.widgets.append(senders)
+
                 save_messages = ctk.CTkCheckBox(left_side, text="Save messages\nto file",
                                                 variable=self.save_messages_in_file)
                 save_messages.pack(pady=(10, 0), anchor=ctk.W, padx=5)
 
                 self.widgets.append(save_messages)
 
-            if option == "From ... stream":
+            if option in ["From ... stream", "Annotate ... streams"]:
                 with_timecodes = ctk.CTkCheckBox(left_side, text="With stream\ntimecodes", variable=self.with_timecodes)
                 with_timecodes.pack(pady=(10, 0), anchor=ctk.W, padx=5)
 
@@ -162,13 +349,15 @@ class GetMessages(ctk.CTk):
         left_side.pack_propagate(False)
         left_side.pack(side=ctk.LEFT, fill=ctk.Y, padx=(0, 10))
 
-        channels: dict = self.get_data()["channels"]
+        channels: dict = self.client.get_data()["channels"]
 
-        select_channel = ctk.CTkOptionMenu(left_side, values=list(channels.keys()) if channels != {} else [],
+        select_channel = ctk.CTkOptionMenu(left_side,
+                                           values=["All channels", *channels.keys()] if channels != {} else [],
                                            variable=self.selected_channel)
         select_channel.pack(pady=(10, 0))
 
-        select_mode = ctk.CTkOptionMenu(left_side, values=["All messages", "Last ... messages", "From ... stream"],
+        select_mode = ctk.CTkOptionMenu(left_side, values=["All messages", "Last ... messages", "From ... stream",
+                                                           "Annotate ... streams", "Watch new messages"],
                                         variable=self.selected_mode, command=on_change_option)
         select_mode.pack(pady=(10, 0))
         on_change_option()
@@ -178,6 +367,8 @@ class GetMessages(ctk.CTk):
                                             hover_color="#242424", command=on_confirm)
         self.confirm_button.pack(pady=10, side=ctk.BOTTOM)
 
+        ctk.CTkButton(left_side, text="Resume", command=on_resume).pack(pady=(10, 0), side=ctk.BOTTOM)
+
         ctk.CTkButton(left_side, text="Settings", command=self.init_settings_menu).pack(pady=10, side=ctk.BOTTOM)
 
         right_side = ctk.CTkFrame(main_frame, width=300, fg_color="transparent")
@@ -191,56 +382,189 @@ class GetMessages(ctk.CTk):
         self.loading_bar = ctk.CTkProgressBar(console_frame, height=20, corner_radius=7)
         self.loading_bar.set(1)
         self.loading_bar.pack(fill=ctk.X, side=ctk.TOP, pady=(0, 10))
+        self.progress_mode = "determinate"
+
+        self.progress_label = ctk.CTkLabel(console_frame, text="", anchor="w", justify=ctk.LEFT)
+        self.progress_label.pack(fill=ctk.X, side=ctk.TOP, pady=(0, 10))
+
+        search_entry = ctk.CTkEntry(console_frame, placeholder_text="Search: words from:sender in:channel "
+                                                                   "since:dd.mm.yyyy until:dd.mm.yyyy")
+        search_entry.pack(fill=ctk.X, side=ctk.TOP, pady=(0, 10))
+        search_entry.bind("<Return>", search)
 
         self.console = ctk.CTkTextbox(console_frame, state=ctk.DISABLED)
         self.console.tag_config("error", foreground="#bf2a2f")
         self.console.tag_config("success", foreground="#24bf24")
         self.console.pack(fill=ctk.BOTH, expand=True, side=ctk.BOTTOM)
 
+        self.renderer.bind(self.console)
+
         console_buttons_frame = ctk.CTkFrame(right_side, height=40)
         console_buttons_frame.pack_propagate(False)
         console_buttons_frame.pack(fill=ctk.X, side=ctk.BOTTOM, pady=(10, 0))
 
         ctk.CTkButton(console_buttons_frame, text="Stop", font=("times new roman", 16, "bold"),
-                      width=50, command=stop).pack(side=ctk.LEFT, padx=5)
+                      width=50, command=self.client.jobs.cancel_all).pack(side=ctk.LEFT, padx=5)
         ctk.CTkButton(console_buttons_frame, text="Clear", font=("times new roman", 16, "bold"),
                       width=50, command=self.clear_console).pack(side=ctk.LEFT, padx=5)
-
-    def _process_messages_queue(self) -> None:
-        while True:
-            try:
-                args: tuple = self.msg_queue.get_nowait()
-                self.get_messages(*args)
-            except queue.Empty:
-                pass
-
-            time.sleep(0.05)
+        ctk.CTkButton(console_buttons_frame, text="Stats", font=("times new roman", 16, "bold"),
+                      width=50, command=self.init_stats_window).pack(side=ctk.LEFT, padx=5)
+        ctk.CTkButton(console_buttons_frame, text="Analytics", font=("times new roman", 16, "bold"),
+                      width=50, command=self.init_analytics_window).pack(side=ctk.LEFT, padx=5)
+        ctk.CTkButton(console_buttons_frame, text="Newer", font=("times new roman", 16, "bold"), width=50,
+                      command=lambda: self.show_view_page(self.view_page - 1)).pack(side=ctk.RIGHT, padx=5)
+        ctk.CTkButton(console_buttons_frame, text="Older", font=("times new roman", 16, "bold"), width=50,
+                      command=lambda: self.show_view_page(self.view_page + 1)).pack(side=ctk.RIGHT, padx=5)
 
     def console_print(self, text: str, type_: Literal["error", "success"] = None) -> None:
-        if self.console.winfo_exists():
-            self.console.configure(state=ctk.NORMAL)
+        self.renderer.write(text, type_, block=False, notify=True)
 
-            if type_ == "error":
-                self.console.insert("1.0", text + "\n", "error")
-            elif type_ == "success":
-                self.console.insert("1.0", text + "\n", "success")
-            else:
-                self.console.insert("1.0", text + "\n")
+    def console_write(self, text: str) -> None:
+        self.renderer.write(text)
 
-            self.console.configure(state=ctk.DISABLED)
-            self.console.see("1.0")
-        else:
-            if type_ == "error":
-                showerror("Error", text)
-            else:
-                showinfo("Info", text)
+    def show_messages(self, display_messages: list[str]) -> None:
+        self.renderer.write("\n".join(reversed(display_messages)))
 
     def clear_console(self) -> None:
+        self.client.view_sources = []
+        self.view_page = 0
+        self.view_bounds = [None]
+
         self.console.configure(state=ctk.NORMAL)
         self.console.delete("1.0", ctk.END)
         self.console.configure(state=ctk.DISABLED)
 
+    def init_stats_window(self) -> None:
+        def refresh() -> None:
+            if not stats_text.winfo_exists():
+                return
+
+            stats: dict = metrics().snapshot()
+            lines: list[str] = [
+                f"Elapsed: {stats['elapsed']:.2f}s",
+                f"Pages: {stats['pages']} ({stats['pages_per_sec']:.1f}/s)",
+                f"Messages: {stats['messages']} ({stats['messages_per_sec']:.1f}/s)",
+                f"Received: {stats['bytes_received'] / 1024:.1f} KiB",
+                f"Blocked on UI: {stats['ui_blocked']:.2f}s",
+                f"Throttled: {stats['throttled']} responses",
+                "",
+                "Stage        count     total      mean       max"
+            ]
+
+            for stage, stage_stats in stats["stages"].items():
+                lines.append(f"{stage:<10} {stage_stats['count']:>7} {stage_stats['total']:>8.2f}s "
+                             f"{stage_stats['mean'] * 1000:>7.1f}ms {stage_stats['max'] * 1000:>7.1f}ms")
+
+            lines.extend(["", "Request latency"])
+            lines.extend(f"{bucket:>10}: {count}" for bucket, count in stats["request_latency"].items())
+
+            stats_text.configure(state=ctk.NORMAL)
+            stats_text.delete("1.0", ctk.END)
+            stats_text.insert("1.0", "\n".join(lines))
+            stats_text.configure(state=ctk.DISABLED)
+
+            stats_window.after(1000, refresh)
+
+        def metrics() -> Metrics:
+            return self.client.jobs.latest.metrics if self.client.jobs.latest is not None else self.client.metrics
+
+        def dump() -> None:
+            path: str = self.client.metrics_path or f"metrics-{time.strftime('%Y%m%d-%H%M%S')}.json"
+            metrics().dump(path)
+            self.console_print(f"Stats saved to {path}", type_="success")
+
+        stats_window = ctk.CTkToplevel(self)
+        stats_window.title("Get Messages History - Stats")
+        stats_window.geometry("420x420")
+
+        stats_text = ctk.CTkTextbox(stats_window, font=("Courier New", 12), state=ctk.DISABLED)
+        stats_text.pack(fill=ctk.BOTH, expand=True, padx=10, pady=(10, 0))
+
+        ctk.CTkButton(stats_window, text="Save JSON", command=dump).pack(pady=10)
+
+        refresh()
+
+    def init_analytics_window(self) -> None:
+        def compute(channels: dict, senders: list[str], streams_ago: int) -> None:
+            try:
+                report: dict = self.client.analytics(channels, self.client.resolve_senders(senders), streams_ago)
+            except Exception as e:
+                self.console_print(f"An error occurred: {type(e)} ({str(e)})", type_="error")
+                report = {}
+
+            self.dispatcher.post(show, report)
+
+        def show(report: dict) -> None:
+            if not analytics_text.winfo_exists():
+                return
+
+            reports[:] = [report] if report else []
+
+            analytics_text.configure(state=ctk.NORMAL)
+            analytics_text.delete("1.0", ctk.END)
+            analytics_text.insert("1.0", "\n".join(self.client.analytics_lines(report)) if report.get("pairs")
+                                  else "No messages stored yet!")
+            analytics_text.configure(state=ctk.DISABLED)
+            refresh_button.configure(state=ctk.NORMAL)
+
+        def refresh() -> None:
+            selected_channel: str = self.selected_channel.get()
+            senders: list[str] = [login for login in re.split(r"[,\s]+", self.senders.lower()) if login]
+
+            if selected_channel == "Select channel":
+                self.console_print("Channel not selected!", type_="error")
+                return
+
+            if data["user_id"] is None and not senders:
+                self.console_print("User id not found!", type_="error")
+                return
+
+            try:
+                streams_ago: int = int(streams_entry.get() or 0)
+            except ValueError:
+                self.console_print("Invalid streams ago!", type_="error")
+                return
+
+            if selected_channel == "All channels":
+                channels: dict = data["channels"]
+            else:
+                channels = {selected_channel: data["channels"][selected_channel]}
+
+            refresh_button.configure(state=ctk.DISABLED)
+            threading.Thread(target=compute, args=(channels, senders, streams_ago), daemon=True).start()
+
+        def dump() -> None:
+            if reports:
+                self.console_print(f"Analytics saved to {self.client.export_analytics(reports[0])}", type_="success")
+
+        data: dict = self.client.get_data()
+        reports: list[dict] = []
+
+        analytics_window = ctk.CTkToplevel(self)
+        analytics_window.title("Get Messages History - Analytics")
+        analytics_window.geometry("520x460")
+
+        controls_frame = ctk.CTkFrame(analytics_window, fg_color="transparent")
+        controls_frame.pack(fill=ctk.X, padx=10, pady=(10, 0))
+
+        streams_entry = ctk.CTkEntry(controls_frame, placeholder_text="Last ... streams (optional)")
+        streams_entry.pack(side=ctk.LEFT, fill=ctk.X, expand=True)
+
+        refresh_button = ctk.CTkButton(controls_frame, text="Refresh", width=80, command=refresh)
+        refresh_button.pack(side=ctk.LEFT, padx=(10, 0))
+
+        analytics_text = ctk.CTkTextbox(analytics_window, font=("Courier New", 12), state=ctk.DISABLED)
+        analytics_text.pack(fill=ctk.BOTH, expand=True, padx=10, pady=(10, 0))
+
+        ctk.CTkButton(analytics_window, text="Save JSON", command=dump).pack(pady=10)
+
+        refresh()
+
     def init_settings_menu(self) -> None:
+        def clear_lookups() -> None:
+            self.client.lookups.clear()
+            cache_label.configure(text="Lookup cache: 0 hits, 0 misses")
+
         self.clear_window()
 
         self.title("Get Messages History - Settings")
@@ -259,36 +583,50 @@ class GetMessages(ctk.CTk):
                       command=self.init_manage_channels_menu).pack(pady=(20, 0), padx=35, anchor=ctk.CENTER)
 
         ctk.CTkButton(settings_frame, text="Enter auth data",
-                      command=self.init_auth_data_menu).pack(pady=(10, 20), padx=35, anchor=ctk.CENTER)
+                      command=self.init_auth_data_menu).pack(pady=(10, 0), padx=35, anchor=ctk.CENTER)
 
-    def init_manage_channels_menu(self) -> None:
-        def add_channel(is_user_name: bool = False) -> None:
-            text: str = "Enter channel name" if not is_user_name else "Enter user name"
-            title: str = "Add channel" if not is_user_name else "Set username"
+        ctk.CTkButton(settings_frame, text="Clear lookup cache",
+                      command=clear_lookups).pack(pady=(10, 0), padx=35, anchor=ctk.CENTER)
 
-            channel_name: str = ctk.windows.CTkInputDialog(text=text, title=title).get_input()
+        cache_label = ctk.CTkLabel(settings_frame, text=f"Lookup cache: {self.client.lookups.hits} hits, "
+                                                        f"{self.client.lookups.misses} misses")
+        cache_label.pack(pady=(10, 20), padx=35, anchor=ctk.CENTER)
 
-            if channel_name:
-                user_id: str | None = self.get_id_by_login(channel_name)
+    def init_manage_channels_menu(self) -> None:
+        def add_channel(is_user_name: bool = False) -> None:
+            def resolve(job: Job) -> None:
+                self.dispatcher.post(on_resolved, self.client.get_id_by_login(channel_name))
 
+            def on_resolved(user_id: str | None | bool) -> None:
                 if user_id:
                     if not is_user_name:
                         def write_new_channel(data: dict) -> dict:
                             data["channels"][channel_name] = user_id
                             return data
 
-                        self.update_data(write_new_channel)
-                        channels_list.insert(ctk.END, channel_name)
+                        self.client.update_data(write_new_channel)
+
+                        if channels_list.winfo_exists():
+                            channels_list.insert(ctk.END, channel_name)
                     else:
                         def write_user_id(data: dict) -> dict:
                             data["user_id"] = [channel_name, user_id]
                             return data
 
-                        self.update_data(write_user_id)
-                        username_label.configure(text=f"Current user: {channel_name}")
+                        self.client.update_data(write_user_id)
+
+                        if username_label.winfo_exists():
+                            username_label.configure(text=f"Current user: {channel_name}")
                 elif user_id is None:
                     self.console_print(f"Channel '{channel_name}' not found!", type_="error")
-                    return
+
+            text: str = "Enter channel name" if not is_user_name else "Enter user name"
+            title: str = "Add channel" if not is_user_name else "Set username"
+
+            channel_name: str = ctk.windows.CTkInputDialog(text=text, title=title).get_input()
+
+            if channel_name:
+                self.client.jobs.start(title, resolve, indeterminate=True)
 
         def delete_channel() -> None:
             selected_channel: str | None = channels_list.get()
@@ -298,7 +636,7 @@ class GetMessages(ctk.CTk):
                     del data["channels"][selected_channel]
                     return data
 
-                self.update_data(delete_channel_from_data)
+                self.client.update_data(delete_channel_from_data)
 
                 selected_index = channels_list.curselection()
 
@@ -308,6 +646,57 @@ class GetMessages(ctk.CTk):
                 self.console_print("No channel selected!", type_="error")
                 return
 
+        def import_channels() -> None:
+            def load_file() -> None:
+                path: str = askopenfilename(parent=import_window, filetypes=[("Text files", "*.txt"), ("All", "*")])
+
+                if path:
+                    with open(path, "r", encoding="UTF-8") as file:
+                        logins_entry.insert(ctk.END, file.read())
+
+            def resolve(logins: list[str]) -> None:
+                found, missing = self.client.import_channels(logins)
+                self.dispatcher.post(on_resolved, found, missing)
+
+            def on_resolved(found: dict[str, str], missing: list[str]) -> None:
+                if channels_list.winfo_exists():
+                    for channel in found:
+                        if channel not in existing:
+                            channels_list.insert(ctk.END, channel)
+
+                if missing:
+                    self.console_print(f"Channels not found: {', '.join(missing)}", type_="error")
+
+                if import_window.winfo_exists():
+                    import_window.destroy()
+
+            def start() -> None:
+                logins: list[str] = [login for login in re.split(r"[,\s]+", logins_entry.get("1.0", ctk.END).lower())
+                                     if login]
+
+                if not logins:
+                    self.console_print("No channels entered!", type_="error")
+                    return
+
+                import_button.configure(state=ctk.DISABLED, text="Importing...")
+                threading.Thread(target=resolve, args=(logins,), daemon=True).start()
+
+            existing: set[str] = set(self.client.get_data()["channels"])
+
+            import_window = ctk.CTkToplevel(self)
+            import_window.title("Import channels")
+            import_window.geometry("300x350")
+
+            logins_entry = ctk.CTkTextbox(import_window)
+            logins_entry.pack(fill=ctk.BOTH, expand=True, padx=10, pady=(10, 0))
+
+            ctk.CTkButton(import_window, text="Load file", command=load_file).pack(pady=(10, 0))
+
+            import_button = ctk.CTkButton(import_window, text="Import", command=start)
+            import_button.pack(pady=10)
+
+        from CTkListbox import CTkListbox
+
         self.clear_window()
 
         self.title("Get Messages History - Manage channels")
@@ -324,13 +713,15 @@ class GetMessages(ctk.CTk):
         left_side.pack_propagate(False)
         left_side.pack(side=ctk.LEFT, fill=ctk.Y, padx=(0, 10))
 
-        buttons_frame = ctk.CTkFrame(left_side, height=95, fg_color="transparent")
+        buttons_frame = ctk.CTkFrame(left_side, height=135, fg_color="transparent")
         buttons_frame.pack_propagate(False)
         buttons_frame.place(relx=0.5, rely=0.5, anchor=ctk.CENTER)
 
         ctk.CTkButton(buttons_frame, text="Add", width=105, command=add_channel).pack(pady=(15, 0), anchor=ctk.CENTER)
         ctk.CTkButton(buttons_frame, text="Remove", width=105, command=delete_channel).pack(pady=(10, 0),
                                                                                             anchor=ctk.CENTER)
+        ctk.CTkButton(buttons_frame, text="Import", width=105, command=import_channels).pack(pady=(10, 0),
+                                                                                             anchor=ctk.CENTER)
 
         right_side = ctk.CTkFrame(main_frame, fg_color="transparent")
         right_side.pack_propagate(False)
@@ -343,7 +734,7 @@ class GetMessages(ctk.CTk):
         bottom_frame.pack_propagate(False)
         bottom_frame.pack(fill=ctk.X, pady=(10, 0))
 
-        data: dict = self.get_data()
+        data: dict = self.client.get_data()
         text: str = f"Current user: {data["user_id"][0] if data["user_id"] else None}"
 
         username_label = ctk.CTkLabel(bottom_frame, text=text)
@@ -351,7 +742,7 @@ class GetMessages(ctk.CTk):
 
         ctk.CTkButton(bottom_frame, text="Set username", command=lambda: add_channel(True)).pack(side=ctk.RIGHT)
 
-        for channel in self.get_data()["channels"].keys():
+        for channel in self.client.get_data()["channels"].keys():
             channels_list.insert(ctk.END, channel)
 
     def init_auth_data_menu(self) -> None:
@@ -421,247 +812,114 @@ class GetMessages(ctk.CTk):
                 data["user_data"] = headers
                 return data
 
-            self.update_data(write_auth_data)
+            self.client.update_data(write_auth_data)
 
             return True
         else:
             self.console_print("Curl text is empty!", type_="error")
             return False
 
-    def do_request(self, sha256hash: str, operation_name: str, variables: dict) -> dict | None:
-        payload: dict = {
-            "extensions": {
-                "persistedQuery": {
-                    "sha256Hash": sha256hash,
-                    "version": 1
-                }
-            },
-            "operationName": operation_name,
-            "variables": variables
-        }
-
-        data: dict = self.get_data()
-        headers: dict = data["user_data"]
-
-        if headers == {}:
-            self.console_print("Auth data not found!", type_="error")
-            return None
-
-        try:
-            response: rq.Response = rq.post("https://gql.twitch.tv/gql", headers=headers, json=payload)
-
-            json_: dict = response.json()
-
-            if "error" in json_ or ("errors" in json_ and json_["errors"][0]["message"] == "failed integrity check"):
-                self.console_print("Failed integrity check! Auth data is probably out of date.", type_="error")
-                return None
-
-            return json_
-        except Exception as e:
-            self.console_print(f"An error occurred: {type(e)} ({str(e)})", type_="error")
-
-            return None
-
-    def get_id_by_login(self, login: str) -> str | None | bool:
-        sha256hash: str = "bf6c594605caa0c63522f690156aa04bd434870bf963deb76668c381d16fcaa5"
-        operation_name: str = "GetUserID"
-        variables: dict = {
-            "login": login,
-            "lookupType": "ACTIVE"
-        }
-
-        response: dict | None = self.do_request(sha256hash, operation_name, variables)
-
-        if response is None:
-            return False
-
-        try:
-            user: dict | None = response["data"]["user"]
+    def view_entries(self, source: Callable[..., Iterator[MessageRecord]], with_timecodes: bool = False,
+                     prefixes: dict[str, str] | None = None,
+                     before: tuple[float, str, str, str] | None = None) -> Iterator[tuple]:
+        for record in source(before):
+            yield record, with_timecodes, prefixes
 
-            return response["data"]["user"]["id"] if user else None
-        except Exception as e:
-            self.console_print(f"An error occurred: {type(e)} ({str(e)})", type_="error")
-            return None
-
-    def get_stream_ago(self, stream_ago: int) -> tuple[str, int] | None:
-        sha256hash: str = "acea7539a293dfd30f0b0b81a263134bb5d9a7175592e14ac3f7c77b192de416"
-        operation_name: str = "FilterableVideoTower_Videos"
-        variables: dict = {
-            "broadcastType": "ARCHIVE",
-            "channelOwnerLogin": self.selected_channel.get(),
-            "limit": stream_ago,
-            "videoSort": "TIME"
-        }
+    def view_page_entries(self, before: tuple[float, str, str, str] | None) -> list[tuple]:
+        entries: Iterator[tuple] = heapq.merge(*(self.view_entries(*source, before)
+                                                 for source in self.client.view_sources),
+                                               key=lambda entry: entry[0].key(), reverse=True)
+        return list(islice(entries, self.renderer.max_lines))
 
-        response: dict | None = self.do_request(sha256hash, operation_name, variables)
-
-        if response is None:
-            return None
-
-        try:
-            node: dict = response["data"]["user"]["videos"]["edges"][-1]["node"]
-            last_stream_date: str = node["publishedAt"]
-            stream_length: int = node["lengthSeconds"]
-            return last_stream_date, stream_length
-        except Exception as e:
-            self.console_print(f"An error occurred: {type(e)} ({str(e)})", type_="error")
-            return None
-
-    def get_messages(self, cursor: str = "", messages_count: int = 0, max_messages: int = 0,
-                     last_stream: tuple | None = None, all_messages: list | None = None) -> None:
-        def stop(with_save: bool = False) -> None:
-            if max_messages == 0:
-                self.loading_bar.stop()
-                self.loading_bar.configure(mode="determinate")
-
-            if with_save:
-                if self.save_messages_in_file.get() and all_messages:
-                    self.save_messages_to_file(all_messages)
-
-            self.loading_bar.set(1)
-            self.confirm_button.configure(state=ctk.NORMAL)
-
-            self.in_process_flag = False
-            self.stop_flag = False
-
-        if all_messages is None:
-            all_messages = []
-
-        self.in_process_flag = True
-        self.confirm_button.configure(state=ctk.DISABLED)
-
-        data: dict = self.get_data()
-        selected_channel: str = self.selected_channel.get()
-
-        sha256hash: str = "eaa9b16f4d95346050e99889df096a51ffa142e49d9e2ce1ae5fae39ac7a8076"
-        operation_name: str = "ViewerCardModLogsMessagesBySender"
-        variables: dict = {
-            "channelID": data["channels"][selected_channel],
-            "cursor": cursor,
-            "senderID": data["user_id"][1]
-        }
-
-        response: dict | None = self.do_request(sha256hash, operation_name, variables)
-
-        if response is None:
-            stop()
+    def show_view_page(self, page: int) -> None:
+        if page < 0 or not self.client.view_sources:
             return
 
-        messages_queue: str = ""
-        stop_flag: bool = False
-
-        try:
-            messages: dict = response["data"]["logs"]["messages"]
-            edges: dict = messages["edges"]
-
-            for i, edge in enumerate(edges):
-                if self.stop_flag:
-                    stop(with_save=True)
-                    return
-
-                node: dict = edge["node"]
-                message_date_obj_utc = datetime.fromisoformat(node["sentAt"].replace("Z", "+00:00"))
-                message_date_obj = message_date_obj_utc.astimezone()
-
-                stream_timecode: str = ""
-
-                if last_stream is not None:
-                    stream_date, stream_length = last_stream
-
-                    last_stream_date_obj_utc = datetime.fromisoformat(stream_date.replace("Z", "+00:00"))
-                    last_stream_date_obj = last_stream_date_obj_utc.astimezone()
-                    end_stream_date_obj = last_stream_date_obj + timedelta(seconds=stream_length)
-
-                    if end_stream_date_obj < message_date_obj:
-                        continue
-                    elif end_stream_date_obj >= message_date_obj >= last_stream_date_obj:
-                        seconds_diff = (message_date_obj - last_stream_date_obj).total_seconds()
-
-                        if self.with_timecodes.get():
-                            stream_timecode_obj = datetime(1, 1, 1) + timedelta(seconds=seconds_diff)
-                            stream_timecode = f"[{stream_timecode_obj.strftime('%H:%M:%S')}] "
-
-                        self.after(0, lambda: self.loading_bar.set((stream_length - seconds_diff) /
-                                                                   stream_length))  # noqa
-                    else:
-                        stop_flag = True
-                        break
-
-                redacted_date_utc: str = message_date_obj_utc.strftime("%d.%m.%Y %H:%M:%S")
-                redacted_date: str = message_date_obj.strftime("%d.%m.%Y %H:%M:%S")
-                sender: dict = node["sender"]
-                message_text: str = node["content"]["text"]
-
-                main_message: str = f"{sender['displayName']}: {message_text}"
-
-                file_message: str = stream_timecode + f"({redacted_date_utc}) {main_message}\n"
-                display_message: str = stream_timecode + f"({redacted_date}) {main_message}"
-
-                all_messages.append(file_message)
-                messages_queue = f"{display_message}\n{messages_queue}"
-
-                messages_count += 1
+        while len(self.view_bounds) <= page:
+            entries: list[tuple] = self.view_page_entries(self.view_bounds[-1])
 
-                if max_messages != 0:
-                    self.after(0, lambda: self.loading_bar.set(messages_count / max_messages))  # noqa
+            if not entries:
+                return
 
-                if messages_count >= max_messages != 0:
-                    stop_flag = True
-                    break
+            self.view_bounds.append(entries[-1][0].key())
 
-            self.after(0, lambda: self.console_print(messages_queue))  # noqa
+        entries = self.view_page_entries(self.view_bounds[page])
 
-            if messages["pageInfo"]["hasNextPage"] and not stop_flag:
-                self.msg_queue.put((edges[-1]["cursor"], messages_count, max_messages, last_stream, all_messages))
-            else:
-                stop(with_save=True)
-        except Exception as e:
-            self.console_print(f"An error occurred: {type(e)} ({str(e)})", type_="error")
-            stop()
+        if not entries:
             return
 
-    def get_data(self) -> dict:
-        self.check_data()
-
-        with open("data.json", "r", encoding="UTF-8") as file:
-            return json.load(file)
+        del self.view_bounds[page + 1:]
+        self.view_bounds.append(entries[-1][0].key())
+        self.view_page = page
 
-    def update_data(self, update: Callable) -> None:
-        data: dict = self.get_data()
+        lines: list[str] = [self.client.formatter.format(record, with_timecodes, prefixes, local=True)
+                            for record, with_timecodes, prefixes in entries]
+        self.renderer.replace("\n".join(reversed(lines)))
 
-        with open("data.json", "w", encoding="UTF-8") as file:
-            json.dump(update(data), file, indent=4)
+    def refresh_ui(self) -> None:
+        self.renderer.flush()
 
-    @staticmethod
-    def save_messages_to_file(messages: list) -> None:
-        if not os.path.exists("messages") or not os.path.isdir("messages"):
-            os.mkdir("messages")
+        if self.loading_bar is None or not self.loading_bar.winfo_exists():
+            return
 
-        i: int = 0
+        jobs: list[Job] = self.client.jobs.active()
+        mode: str = "indeterminate" if any(job.indeterminate for job in jobs) else "determinate"
 
-        while True:
-            if not os.path.exists(f"messages/messages{i if i != 0 else ""}.txt"):
-                with open(f"messages/messages{i if i != 0 else ""}.txt", "w", encoding="UTF-8") as file:
-                    file.writelines(reversed(messages))
+        if mode != self.progress_mode:
+            self.progress_mode = mode
+            self.loading_bar.configure(mode=mode)
 
-                return
+            if mode == "indeterminate":
+                self.loading_bar.start()
+            else:
+                self.loading_bar.stop()
 
-            i += 1
+        if mode == "determinate":
+            self.loading_bar.set(sum(job.total_progress() for job in jobs) / len(jobs) if jobs else 1)
+
+        progress: list[str] = [f"{key} {value:.0%}" for job in jobs if not job.indeterminate
+                               for key, value in job.progress_items() if value < 1]
+        self.progress_label.configure(text="  ".join(progress[:8]) + (f"  +{len(progress) - 8} more"
+                                                                       if len(progress) > 8 else ""))
+
+    def on_job_finished(self, job: Job) -> None:
+        if job.error is not None:
+            self.console_print(f"An error occurred: {type(job.error)} ({str(job.error)})", type_="error")
+
+    def get_messages(self, max_messages: int = 0, streams_ago: int = 0, senders: list[str] | None = None,
+                     annotate: bool = False, resume: bool = False, watch: bool = False) -> Job:
+        def run(job: Job) -> None:
+            if resume:
+                if not self.client.resume_job(job.set_progress):
+                    self.console_print("Nothing to resume!", type_="error")
+            elif watch:
+                self.client.watch(channels, self.client.resolve_senders(senders), save_messages)
+            else:
+                self.client.run_export(channels, sender_id, max_messages, streams_ago, senders, annotate,
+                                       with_timecodes, save_messages, job.set_progress)
 
-    @staticmethod
-    def check_data() -> None:
-        if os.path.exists("data.json"):
-            try:
-                with open("data.json", "r", encoding="UTF-8") as file:
-                    data = json.load(file)
+        data: dict = self.client.get_data()
+        selected_channel: str = self.selected_channel.get()
+        sender_id: str | None = data["user_id"][1] if data["user_id"] else None
+        with_timecodes: bool = self.with_timecodes.get()
+        save_messages: bool = self.save_messages_in_file.get()
+        channels: dict = {}
+
+        if resume:
+            name: str = "resume"
+        elif selected_channel == "All channels":
+            name = "all channels"
+            channels = data["channels"]
+        else:
+            name = selected_channel
+            channels = {selected_channel: data["channels"][selected_channel]}
 
-                if "channels" in data and "user_data" in data and "user_id" in data:
-                    return
-            except json.decoder.JSONDecodeError:
-                pass
+        self.client.view_sources = []
+        self.view_page = 0
+        self.view_bounds = [None]
 
-        with open("data.json", "w", encoding="UTF-8") as file:
-            json.dump({"channels": {}, "user_data": {}, "user_id": None}, file, indent=4)
+        return self.client.jobs.start(name, run, watch or max_messages == 0 and streams_ago == 0
+                                      and len(channels) == 1 and not senders)
 
 
 def main() -> None:
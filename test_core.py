@@ -0,0 +1,161 @@
+import json
+import os
+import time
+
+import pytest
+import requests as rq
+from benchmark import BenchClient, StubGQLServer, StubHistory, synthetic_records
+from core import Config, GQLSession, MessageColumns, MessageExporter, MessageFormatter, MessageRecord, ModLogClient
+from core import ModLogPager, StreamIndex
+
+
+def fields(record: MessageRecord) -> tuple:
+    return (record.id, record.sent_at, record.sent_ts, record.channel_id, record.sender_id, record.display_name,
+            record.text, record.stream_start, record.stream_label)
+
+
+def page_payload(cursor: str = "") -> dict:
+    return ModLogClient.gql_payload(*ModLogClient.mod_logs_operation("channel", "sender", cursor))
+
+
+def next_cursor(response: rq.Response) -> str:
+    return response.json()["data"]["logs"]["messages"]["edges"][-1]["cursor"]
+
+
+@pytest.fixture
+def server():
+    with StubGQLServer(StubHistory(2000)) as server:
+        yield server
+
+
+@pytest.fixture
+def client(server: StubGQLServer, tmp_path, monkeypatch) -> BenchClient:
+    monkeypatch.chdir(tmp_path)
+
+    with open("data.json", "w", encoding="UTF-8") as file:
+        json.dump({"channels": {"bench": "channel"}, "user_data": {"client-id": "bench"},
+                   "user_id": ["sender", "sender"], "network": {"url": server.url, "rate": 1000, "burst": 1000}},
+                  file)
+
+    return BenchClient(Config())
+
+
+def test_session_reuses_one_connection(server: StubGQLServer) -> None:
+    cursor: str = ""
+
+    with GQLSession(server.url) as session:
+        for _ in range(20):
+            cursor = next_cursor(session.gql({}, page_payload(cursor)))
+
+    assert server.requests == 20
+    assert server.connections == 1
+
+
+def test_fresh_posts_open_a_connection_per_page(server: StubGQLServer) -> None:
+    cursor: str = ""
+
+    for _ in range(5):
+        cursor = next_cursor(rq.post(server.url, json=page_payload(cursor), timeout=5))
+
+    assert server.connections == 5
+
+
+def test_session_honours_retry_after_on_503(server: StubGQLServer) -> None:
+    server.errors.append((503, 1))
+
+    with GQLSession(server.url, backoff_factor=0) as session:
+        start: float = time.monotonic()
+        response: rq.Response = session.gql({}, page_payload())
+
+    assert response.status_code == 200
+    assert time.monotonic() - start >= 0.9
+    assert server.requests == 2
+
+
+def test_client_pauses_on_429(server: StubGQLServer, client: BenchClient) -> None:
+    server.errors.append((429, 0.5))
+
+    start: float = time.monotonic()
+    response: rq.Response = client.send_gql({}, page_payload())
+
+    assert response.status_code == 200
+    assert time.monotonic() - start >= 0.45
+    assert client.metrics.snapshot()["throttled"] == 1
+    assert server.connections == 1
+
+
+def test_message_columns_round_trip() -> None:
+    records: list[MessageRecord] = [
+        MessageRecord("m1", "2024-01-01T00:00:00Z", 1704067200.0, "c1", "s1", "Ünïcødé", "привет 👋", None, None),
+        MessageRecord("m2", "2024-01-01T00:01:00Z", 1704067260.0, "c2", "s1", "Sender", "", 1704060000.0, "#1"),
+        MessageRecord("", "2024-01-01T00:02:00Z", 1704067320.0, "c1", "s2", "Sender", "a" * 1000, None,
+                      "off-stream")
+    ]
+    columns: MessageColumns = MessageColumns()
+
+    for record in records:
+        columns.append(record)
+
+    assert len(columns) == 3
+    assert [fields(record) for record in columns] == [fields(record) for record in records]
+    assert [fields(record) for record in reversed(columns)] == [fields(record) for record in reversed(records)]
+
+    columns.clear()
+    columns.append(records[1])
+
+    assert len(columns) == 1
+    assert fields(columns[0]) == fields(records[1])
+
+
+def test_exporter_stitches_spilled_chunks(tmp_path) -> None:
+    history: StubHistory = StubHistory(33)
+    records: list[MessageRecord] = synthetic_records(history, 0, 33)
+    exporter: MessageExporter = MessageExporter("spill", str(tmp_path))
+    exporter.chunk_size = 7
+
+    for i in range(0, 33, 5):
+        exporter.write_page(records[i:i + 5], with_timecodes=True)
+
+    spill_dir: str = exporter.spill_dir
+
+    assert len(exporter.chunks) == 4
+
+    path: str = exporter.close()
+
+    with open(path, "r", encoding="UTF-8") as file:
+        lines: list[str] = file.readlines()
+
+    formatter: MessageFormatter = MessageFormatter()
+
+    assert lines == [formatter.format(record, with_timecodes=True) for record in reversed(records)]
+    assert not os.path.exists(spill_dir)
+    assert os.listdir(tmp_path) == [os.path.basename(path)]
+
+
+def test_stream_index_locate() -> None:
+    index: StreamIndex = StreamIndex([("2024-01-02T00:00:00Z", 3600), ("2024-01-01T00:00:00Z", 1800)])
+    first: float = 1704067200.0
+    second: float = 1704153600.0
+
+    assert index.start == first
+    assert index.end == second + 3600
+    assert index.locate(first - 1) is None
+    assert index.locate(first) == (first, "#2")
+    assert index.locate(first + 1800) == (first, "#2")
+    assert index.locate(first + 1801) is None
+    assert index.locate(second + 60) == (second, "#1")
+    assert index.locate(second + 3601) is None
+
+
+@pytest.mark.parametrize("prefetch", [0, 2])
+def test_pager_reports_malformed_pages(prefetch: int) -> None:
+    def fetch(cursor: str) -> dict | None:
+        return history.messages(cursor) if cursor == "" else {"edges": []}
+
+    history: StubHistory = StubHistory(250)
+    errors: list[Exception] = []
+    pager: ModLogPager = ModLogPager(fetch, prefetch=prefetch, on_error=errors.append)
+
+    assert [len(edges) for edges in pager.pages()] == [100]
+    assert pager.failed
+    assert [type(error) for error in errors] == [KeyError]